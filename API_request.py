@@ -1,13 +1,133 @@
 import pandas as pd
-import requests, os, time
+import requests, os, time, json, hashlib, threading, contextvars
 from dotenv import load_dotenv
 from collections import defaultdict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
+from tracing import tracer
+from schema_registry import SCHEMAS, get_schema
+from raw_archive import raw_archive
+from warehouse_backend import local_file
 
 
 class API_Request:
 
 
+    def build_frame(self, rows, names):
+        '''
+            Build data frame from the split data lines at once
+            Values are kept as string -> saved csv keeps the value written by API
+
+            param :
+                rows : list of split data lines
+                names : column names
+        '''
+        if not rows:
+            return pd.DataFrame(columns=names)
+        return pd.DataFrame(rows, columns=names, dtype=str)
+
+
+    def parse_weather(self, text):
+        '''
+            Parse raw text of kma_sfcdd.php (disp=1, help=1) into data frame
+            The header of documentation session is checked against schema registry
+
+            param :
+                text : response text of API
+        '''
+        lines = text.splitlines()
+
+        # split documentation and main data
+        info_lines = [line.lstrip('#') for line in lines if line.startswith('#')]
+        data_lines = lines[len(info_lines)-1 : -1]
+        info_lines = info_lines[4:-6]
+
+        # Extract header from documentationo
+        header_list = [info.split()[1] for info in info_lines]
+
+        # The header must match the registered schema
+        schema = SCHEMAS['SFC']
+        schema.check_header(header_list)
+
+        # Each line ends with '=' -> fields after the schema columns are dropped
+        n = len(schema.names)
+        return self.build_frame([line.split(',')[:n] for line in data_lines], schema.names)
+
+
+    def parse_location(self, text, inf='SFC'):
+        '''
+            Parse raw text of stn_inf.php into data frame
+            Variable names and units of header lines are merged into column names
+            The columns are checked against schema registry if inf is registered
+
+            param :
+                text : response text of API
+                inf : The information about Stations (SFC, AWS, NKO, UV, BUOY)
+        '''
+        lines = text.splitlines()
+
+        # lines of documentation will be separated into header else main
+        header = []
+        main = []
+        for line in lines:
+            if '#' in line:
+                header.append(line.lstrip('# '))
+            elif line.strip():
+                main.append(line.strip())
+
+        # extract header info - variable names and its units
+        header_list = []
+        for head, sub in zip(header[-3].split(), header[-2].split()):
+            if '-' not in sub:
+                header_list.append(f'{head}_{sub}')
+            else:
+                header_list.append(head)
+
+        n = len(header_list)
+        df = self.build_frame([main_data.split()[:n] for main_data in main], header_list)
+
+        # Drop useless column
+        # For SFC
+        if inf == 'SFC':
+            df = df.drop(columns='BASIN')
+
+        # The columns must match the registered schema (if inf is registered)
+        schema = get_schema(f'stn_{inf}')
+        if schema:
+            schema.check_header(df.columns)
+
+        return df
+
+
+    def parse_marine(self, text):
+        '''
+            Parse raw text of sea_obs.php into data frame
+            Returns (documentation lines, data frame)
+
+            param :
+                text : response text of API
+        '''
+        lines = text.splitlines()
+
+        # Split data by documentation
+        meta, main_data = [], []
+        for line in lines:
+            meta.append(line.lstrip('# ')) if line.startswith('#') else main_data.append(line)
+
+        # Merge 2 lines into column names
+        header_list = [f'{head}_{sub}' for head, sub in zip(meta[-3].split(), meta[-2].split())]
+
+        # The header must match the registered schema
+        schema = SCHEMAS['marine']
+        schema.check_header(header_list)
+
+        # remove all ',' and split by any spaces -> first (TP) and last ('=') fields dropped
+        n = len(schema.names)
+        rows = [main.replace(',', ' ').split()[1:n + 1] for main in main_data if main.strip()]
+        return meta, self.build_frame(rows, schema.names)
+
+
     def request_api_weather (self, tm:str = None , stn:str = None, disp:str = '1', help:str = '1'):
         '''
             Request weather data to apihub.kma.go.kr
@@ -30,7 +150,7 @@ class API_Request:
         '''
 
         # URL for API
-        url = 'https://apihub.kma.go.kr/api/typ01/url/kma_sfcdd.php?'
+        url = self.base_url + 'kma_sfcdd.php?'
         tm_ = (f"tm={tm}&") if tm else ""
         stn_ = (f"stn={stn}&") if stn else ""
         disp_ = f"disp={disp}&"
@@ -39,44 +159,29 @@ class API_Request:
         ready_url = url + tm_ + stn_ + disp_ + help_ + authKey_
 
         # Request API from URL
-        try:
-            response = requests.get(ready_url)
-            response.raise_for_status()
-
-            lines = response.text.splitlines()
-
-            # split documentation and main data
-            info_lines = [line.lstrip('#') for line in lines if line.startswith('#')]
-            data_lines = lines[len(info_lines)-1 : -1]
-            info_lines = info_lines[4:-6]
-
-            # Extract header from documentationo
-            header_list = []
-            for info in info_lines:
-                parse = info.split()[1].split()[-1]
-                header_list.append(parse)
-            
-
-            # each header will take one's list and it will convert into data frame
-            data = defaultdict(list)
+        with tracer.span('API_Request.request_api_weather', tm=tm) as span:
+            try:
+                response = requests.get(ready_url)
+                response.raise_for_status()
+                span.add('bytes_in', len(response.content))
+                self.archive.put(ready_url, response.text)
 
-            # Classification of header and its main info
-            for main_data in data_lines:
-                for head, dt in zip(header_list, main_data.split(',')):
-                    data[head].append(dt)
+                # Parse response text into data frame
+                df = self.parse_weather(response.text)
 
-            # Convert dictionary into data frame
-            df = pd.DataFrame(data)
+                # Save dataframe as csv
+                out_path = f'data/weather_condition/{tm}.csv'
+                self.save_csv(df, out_path)
+                span.add('rows', len(df))
+                span.add('bytes_out', os.path.getsize(out_path))
 
-            # Save dataframe as csv
-            df.to_csv(f'data/weather_condition/{tm}.csv', index=False, encoding='utf-8-sig')
+                return True
 
-            return True
-
-        # Exception catcher
-        except Exception as e:
-            print(f'Error detected : {e}')
-            return False
+            # Exception catcher
+            except Exception as e:
+                span.fail(e)
+                print(f'Error detected : {e}')
+                return False
 
 
     def request_api_location(self, inf='SFC', tm=None, stn=None, help='0'):
@@ -102,7 +207,7 @@ class API_Request:
                     0 : Exclude explanation of field
         '''
         # URL for API
-        url = 'https://apihub.kma.go.kr/api/typ01/url/stn_inf.php?'
+        url = self.base_url + 'stn_inf.php?'
         inf_ = f'inf={inf}&'
         tm_ = (f"tm={tm}&") if tm else ""
         stn_ = (f"stn={stn}&") if stn else ""
@@ -111,53 +216,28 @@ class API_Request:
         ready_url = url + inf_ + tm_ + stn_ + help_ + authKey_
 
         # Request API via URL
-        try:
-            response = requests.get(ready_url)
-            response.raise_for_status()
-            lines = response.text.splitlines()
-
-            # lines of documentation will be separated into header else main
-            header = []
-            main = []
-            for line in lines:
-                if '#' in line:
-                    header.append(line.lstrip('# '))
-                else:
-                    main.append(line.strip())
-            
-            # extract header info - variable names and its units
-            header_list = []
-            for head, sub in zip(header[-3].split(), header[-2].split()):
-                if '-' not in sub:
-                    header_list.append(f'{head}_{sub}')
-                else:
-                    header_list.append(head)
-            
-            # each header will take one's list and it will convert into data frame
-            data = defaultdict(list)
-
-            # Classification of header and its main info
-            for main_data in main:
-                for head, dt in zip(header_list, main_data.split()):
-                    data[head].append(dt)
-            
-            # Drop useless column
-            # For SFC
-            if inf == 'SFC':
-                del data['BASIN']
-
-            # Convert data into dataframe
-            df = pd.DataFrame(data)
-
-            # Save dataframe as csv
-            df.to_csv(f'data/stn_{inf}_info.csv', index=False, encoding='utf-8-sig')
-            print(f'Working Done - {inf}')
-            return True
-
-        # Error Catcher
-        except Exception as e:
-            print(f'Error detected : {e}')
-            return False
+        with tracer.span('API_Request.request_api_location', inf=inf) as span:
+            try:
+                response = requests.get(ready_url)
+                response.raise_for_status()
+                span.add('bytes_in', len(response.content))
+                self.archive.put(ready_url, response.text)
+                # Parse response text into data frame
+                df = self.parse_location(response.text, inf)
+
+                # Save dataframe as csv
+                out_path = f'data/stn_{inf}_info.csv'
+                self.save_csv(df, out_path)
+                span.add('rows', len(df))
+                span.add('bytes_out', os.path.getsize(out_path))
+                print(f'Working Done - {inf}')
+                return True
+
+            # Error Catcher
+            except Exception as e:
+                span.fail(e)
+                print(f'Error detected : {e}')
+                return False
 
 
     def request_api_loop(self, initial_date, end_date):
@@ -179,26 +259,27 @@ class API_Request:
         # Will be used for time calculation
         start = time.time()
 
-        # Loop for set dates
-        while initial_date <= end_date:
+        with tracer.span('API_Request.request_api_loop', initial_date=str(initial_date), end_date=str(end_date)):
+            # Loop for set dates
+            while initial_date <= end_date:
             
-            print(f'[Fetching : {initial_date}] initiated . . .')
+                print(f'[Fetching : {initial_date}] initiated . . .')
 
-            # set the datetime into yyyymmdd format for api request
-            yyyymmdd = initial_date.strftime("%Y%m%d")
+                # set the datetime into yyyymmdd format for api request
+                yyyymmdd = initial_date.strftime("%Y%m%d")
 
-            # run request
-            result = self.request_api_weather(tm=yyyymmdd)
+                # run request
+                result = self.request_api_weather(tm=yyyymmdd)
 
-            # Debug -> to see how requests going on
-            if result:
-                print(f'Succeed to get respond from API request at {yyyymmdd}')
-            else:
-                print(f'Request Fail at {yyyymmdd}')
-                break
+                # Debug -> to see how requests going on
+                if result:
+                    print(f'Succeed to get respond from API request at {yyyymmdd}')
+                else:
+                    print(f'Request Fail at {yyyymmdd}')
+                    break
 
-            # increase date by a day
-            initial_date += timedelta(days=1)
+                # increase date by a day
+                initial_date += timedelta(days=1)
 
         # end time for time cacluation
         end = time.time()
@@ -225,7 +306,7 @@ class API_Request:
         '''
 
         # URL of Endpoint
-        url = 'https://apihub.kma.go.kr/api/typ01/url/sea_obs.php?'
+        url = self.base_url + 'sea_obs.php?'
         tm_ = (f"tm={tm}&") if tm else ""
         stn_ = (f"stn={stn}&") if stn else ""
         help_ = f"help={help}&"
@@ -233,50 +314,34 @@ class API_Request:
         ready_url = url + tm_ + stn_ + help_ + authKey_
 
         # Request API from URL
-        try:
-            response = requests.get(ready_url)
-            response.raise_for_status()
-
-            lines = response.text.splitlines()
-
-            # Split data by documentation
-            meta, main_data = [], []
-            for line in lines:
-                meta.append(line.lstrip('# ')) if line.startswith('#') else main_data.append(line)
-                    
-            # if help = 1 : make meta info for getting data
-            if help:
-                with open(os.getenv('FILES_PATH_marine') + '\\marine_meta.txt', 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(meta[5:-3]))
-            
-            header_list = []
-
-            # Merge 2 lines into column names
-            for head, sub in zip(meta[-3].split(), meta[-2].split()):
-                header_list.append(f'{head}_{sub}')
-
-            data = defaultdict(list)
-
-            # remove all ',' and split by any spaces
-            for main in main_data:
-                parse = main.replace(',','') 
-
-                # insert main value into following column
-                for key, val in zip(header_list, parse.split()[1:-1]):
-                    data[key].append(val)
-
-            # Convert dictionary into data frame
-            df = pd.DataFrame(data)
-
-            # Save dataframe as csv
-            df.to_csv(f'data/marine_condition/{tm}.csv', index=False, encoding='utf-8-sig')
-
-            return True
-
-        # Exception catcher
-        except Exception as e:
-            print(f'Error detected : {e}')
-            return False
+        with tracer.span('API_Request.request_api_marine', tm=tm) as span:
+            try:
+                response = requests.get(ready_url)
+                response.raise_for_status()
+                span.add('bytes_in', len(response.content))
+                self.archive.put(ready_url, response.text)
+
+                # Parse response text into data frame
+                meta, df = self.parse_marine(response.text)
+
+                # if help = 1 : make meta info for getting data
+                if help:
+                    with open(os.getenv('FILES_PATH_marine') + '\\marine_meta.txt', 'w', encoding='utf-8') as f:
+                        f.write('\n'.join(meta[5:-3]))
+
+                # Save dataframe as csv
+                out_path = f'data/marine_condition/{tm}.csv'
+                self.save_csv(df, out_path)
+                span.add('rows', len(df))
+                span.add('bytes_out', os.path.getsize(out_path))
+
+                return True
+
+            # Exception catcher
+            except Exception as e:
+                span.fail(e)
+                print(f'Error detected : {e}')
+                return False
         
 
     def request_api_loop_marine(self, initial_date, end_date):
@@ -300,26 +365,27 @@ class API_Request:
         # Will be used for time calculation
         start = time.time()
 
-        # Loop for set dates
-        while initial_date <= end_date:
+        with tracer.span('API_Request.request_api_loop_marine', initial_date=str(initial_date), end_date=str(end_date)):
+            # Loop for set dates
+            while initial_date <= end_date:
             
-            print(f'[Fetching : {initial_date}] initiated . . .')
+                print(f'[Fetching : {initial_date}] initiated . . .')
 
-            # set the datetime into yyyymmdd format for api request
-            yyyymmddhhmm = initial_date.strftime("%Y%m%d%H%M")
+                # set the datetime into yyyymmdd format for api request
+                yyyymmddhhmm = initial_date.strftime("%Y%m%d%H%M")
 
-            # run request
-            result = self.request_api_marine(tm=yyyymmddhhmm)
+                # run request
+                result = self.request_api_marine(tm=yyyymmddhhmm)
 
-            # Debug -> to see how requests going on
-            if result:
-                print(f'Succeed to get respond from API request at {yyyymmddhhmm}')
-            else:
-                print(f'Request Fail at {yyyymmddhhmm}')
-                break
+                # Debug -> to see how requests going on
+                if result:
+                    print(f'Succeed to get respond from API request at {yyyymmddhhmm}')
+                else:
+                    print(f'Request Fail at {yyyymmddhhmm}')
+                    break
 
-            # increase date by a day
-            initial_date += timedelta(days=1)
+                # increase date by a day
+                initial_date += timedelta(days=1)
 
         # end time for time cacluation
         end = time.time()
@@ -327,6 +393,367 @@ class API_Request:
         # Calculate time spent
         elapse = end - start
         print(f'Total Run time : {elapse: .2f} sec')    
+
+
+    def session(self):
+        '''
+            requests.Session of current thread -> connection is reused by each worker
+        '''
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+
+    def get_text(self, ready_url, span, retries=3, source=None):
+        '''
+            GET with retry and return body of response
+            429, 5xx, connection error and truncated body (no END mark) are retried
+
+            param:
+                ready_url : URL of request
+                span : running span -> bytes and retries are counted
+                retries : number of retry after first request
+                source : fetch mode recorded in the raw archive (ex - range)
+        '''
+        for attempt in range(retries + 1):
+            wait = 0.5 * 2 ** attempt
+            try:
+                response = self.session().get(ready_url, timeout=30)
+                if response.status_code == 429:
+                    wait = float(response.headers.get('Retry-After', wait))
+                response.raise_for_status()
+                span.add('bytes_in', len(response.content))
+
+                # Body cut in the middle -> END mark is missing
+                if not response.text.rstrip().endswith('7777END'):
+                    raise ValueError('Truncated response')
+                self.archive.put(ready_url, response.text, source)
+                return response.text
+
+            except (requests.RequestException, ValueError) as e:
+                status = e.response.status_code if isinstance(e, requests.HTTPError) else None
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == retries:
+                    raise
+                span.add('retries')
+                time.sleep(wait)
+
+
+    def fetch_marine(self, tm, stn=None, retries=3, source=None):
+        '''
+            Request marine observation of one timestamp and return it as data frame
+            Nothing is saved -> used by request_api_range_marine and ingest_daemon
+
+            param:
+                tm : The specific time (YearMonthDayHourMin) in KST
+                stn : The station separated by ':' (None -> all station)
+                retries : number of retry after first request
+                source : fetch mode recorded in the raw archive ('range' -> per-day partitions)
+        '''
+        url = self.base_url + 'sea_obs.php?'
+        tm_ = f"tm={tm}&"
+        stn_ = (f"stn={stn}&") if stn else ""
+        help_ = "help=0&"
+        authKey_ = f"authKey={self.api_key}"
+        ready_url = url + tm_ + stn_ + help_ + authKey_
+
+        with tracer.span('API_Request.fetch_marine', tm=tm) as span:
+            meta, df = self.parse_marine(self.get_text(ready_url, span, retries, source))
+            span.add('rows', len(df))
+            return df
+
+
+    def fetch_weather(self, tm, stn=None, retries=3):
+        '''
+            Request weather data of one day and return it as data frame
+            Nothing is saved -> used by ingest_daemon
+
+            param:
+                tm : The specific time (YearMonthDay) in KST
+                stn : The station separated by ':' (None -> all station)
+                retries : number of retry after first request
+        '''
+        url = self.base_url + 'kma_sfcdd.php?'
+        tm_ = f"tm={tm}&"
+        stn_ = (f"stn={stn}&") if stn else ""
+        help_ = "disp=1&help=1&"
+        authKey_ = f"authKey={self.api_key}"
+        ready_url = url + tm_ + stn_ + help_ + authKey_
+
+        with tracer.span('API_Request.fetch_weather', tm=tm) as span:
+            df = self.parse_weather(self.get_text(ready_url, span, retries))
+            span.add('rows', len(df))
+            return df
+
+
+    def fetch_location(self, inf='SFC', retries=3):
+        '''
+            Request station info of one inf type and return it as data frame
+            Nothing is saved -> used by refresh_locations
+
+            param:
+                inf : The information about Stations (SFC, AWS, NKO, UV, BUOY)
+                retries : number of retry after first request
+        '''
+        url = self.base_url + 'stn_inf.php?'
+        inf_ = f'inf={inf}&'
+        help_ = "help=0&"
+        authKey_ = f"authKey={self.api_key}"
+        ready_url = url + inf_ + help_ + authKey_
+
+        with tracer.span('API_Request.fetch_location', inf=inf) as span:
+            df = self.parse_location(self.get_text(ready_url, span, retries), inf)
+            span.add('rows', len(df))
+            return df
+
+
+    def hide_key(self, text):
+        '''
+            Hide authKey in text of error (URL of request is in the message)
+        '''
+        return str(text).replace(self.api_key, '***') if self.api_key else str(text)
+
+
+    def station_hash(self, df):
+        '''
+            Hash of station list -> same stations give same hash whatever the row order
+        '''
+        df = df.astype(str).sort_values(list(df.columns), kind='stable')
+        return hashlib.sha256(df.to_csv(index=False).encode('utf-8')).hexdigest()
+
+
+    def refresh_locations(self, infs=('SFC', 'AWS', 'NKO', 'UV', 'BUOY'), ttl=None, force=False,
+                          workers=5):
+        '''
+            Refresh station info of every inf type concurrently
+            Each type is cached (STN_CACHE_PATH, default data/stn_cache.json) with
+            the time of last fetch and the hash of its station list
+                fetched within ttl -> not requested
+                same hash -> station file is not rewritten
+            Only a changed station list rewrites the file
+            (STN_{inf}_FILE_PATH of registered types, else data/stn_{inf}_info.csv)
+
+            param:
+                infs : The information about Stations (SFC, AWS, NKO, UV, BUOY)
+                ttl : seconds a fetch stays fresh, int or dict of inf -> seconds
+                    (None -> STN_TTL in .env, default 86400)
+                force : if True -> ttl is ignored
+                workers : number of concurrent requests
+            Returns the paths of rewritten files -> station tables to be loaded again
+                (small files are loaded directly by backend.load_table, not through S3)
+        '''
+        cache_path = os.getenv('STN_CACHE_PATH', 'data/stn_cache.json')
+        cache = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding='utf-8') as f:
+                    cache = json.load(f)
+            except ValueError as e:
+                # broken cache -> every type is fetched again and the cache rewritten
+                print(f'Station cache not readable -> fetched again ({e})')
+        cache = cache if isinstance(cache, dict) else {}
+
+        ttl = ttl if ttl is not None else int(os.getenv('STN_TTL', 86400))
+        now = time.time()
+
+        def refresh(inf):
+            entry = cache.get(inf, {})
+            schema = get_schema(f'stn_{inf}')
+            out_path = local_file(schema) if schema else f'data/stn_{inf}_info.csv'
+            limit = ttl.get(inf, 86400) if isinstance(ttl, dict) else ttl
+            if not force and os.path.exists(out_path) and now - entry.get('fetched', 0) < limit:
+                return inf, 'fresh', None
+
+            df = self.fetch_location(inf)
+            digest = self.station_hash(df)
+
+            # no cache yet -> hash of the existing file
+            if 'hash' not in entry and os.path.exists(out_path):
+                entry['hash'] = self.station_hash(pd.read_csv(out_path, dtype=str, keep_default_na=False,
+                                                              encoding='utf-8-sig'))
+
+            changed = digest != entry.get('hash') or not os.path.exists(out_path)
+            if changed:
+                self.save_csv(df, out_path)
+            cache[inf] = {'fetched': now, 'hash': digest, 'rows': len(df)}
+            return inf, 'changed' if changed else 'unchanged', out_path if changed else None
+
+        changed = []
+        with tracer.span('API_Request.refresh_locations', infs=','.join(infs)) as span, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, refresh, inf) for inf in infs]
+            for future, inf in zip(futures, infs):
+                try:
+                    inf, status, out_path = future.result()
+                    if status != 'fresh':
+                        print(f'Station info {inf} : {status}')
+                    if out_path:
+                        changed.append(out_path)
+                except Exception as e:
+                    span.fail(e)
+                    print(f'Station info {inf} : failed -> {self.hide_key(e)}')
+            span.set(changed=len(changed))
+
+        # cache written through temp file -> no partial json
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        with open(cache_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(cache_path + '.tmp', cache_path)
+        return changed
+
+
+    def save_csv(self, df, out_path):
+        '''
+            Write data frame into csv through a temp file
+            -> a stopped run never leaves a partial file at out_path
+        '''
+        tmp_path = out_path + '.tmp'
+        df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+        os.replace(tmp_path, out_path)
+
+
+    def parse_step(self, step):
+        '''
+            Cast step of range mode into timedelta
+            param:
+                step : '10m', '10min', '1h', '1d' or minutes as int
+        '''
+        if isinstance(step, timedelta):
+            delta = step
+        elif isinstance(step, int):
+            delta = timedelta(minutes=step)
+        else:
+            text = step.strip().lower()
+            for unit, key in (('min', 'minutes'), ('m', 'minutes'), ('h', 'hours'), ('d', 'days')):
+                if text.endswith(unit):
+                    delta = timedelta(**{key: int(text[:-len(unit)])})
+                    break
+            else:
+                raise ValueError(f'Unknown step : {step}')
+
+        # zero or negative step -> timestamp loops never end
+        if delta <= timedelta(0):
+            raise ValueError(f'Step must be positive : {step}')
+        return delta
+
+
+    def save_marine_day(self, day, frames, out_dir):
+        '''
+            Write observations of a day into one csv ({out_dir}/{yyyymmdd}.csv)
+            Rows already stored for the day are kept, duplicated (TM_KST, STN_ID)
+            are removed with the latest fetch winning
+
+            param:
+                day : yyyymmdd
+                frames : data frames fetched for the day
+                out_dir : folder of per-day files
+        '''
+        out_path = os.path.join(out_dir, f'{day}.csv')
+        if os.path.exists(out_path):
+            frames = [pd.read_csv(out_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')] + frames
+
+        df = pd.concat(frames, ignore_index=True)
+        before = len(df)
+        df = df.drop_duplicates(subset=['TM_KST', 'STN_ID'], keep='last')
+        df = df.sort_values(['TM_KST', 'STN_ID'], kind='stable')
+
+        # write into temp file first -> no partial file is left on failure
+        self.save_csv(df, out_path)
+        return len(df), before - len(df)
+
+
+    def request_api_range_marine(self, initial_date, end_date, step='1h', stn=None,
+                                 workers=8, out_dir='data/marine_range'):
+        '''
+            Range mode of marine observation
+            Every timestamp between initial date ~ end date by step is requested concurrently
+            (all windows at once) and saved as one compact csv per day (a day per window)
+            The date format is yyyymmddhhmm
+
+            param:
+                initial_date : first timestamp for request
+                end_date : last timestamp for request
+                step : interval of timestamp ('10m', '1h', '1d' ...)
+                stn : The station separated by ':' (None -> all station)
+                workers : number of concurrent requests
+                out_dir : folder of per-day files
+        '''
+
+        # Set the format for Date
+        fmt = "%Y-%m-%d-%H-%M" if "-" in initial_date else "%Y%m%d%H%M"
+        initial_date = datetime.strptime(initial_date, fmt)
+        end_date = datetime.strptime(end_date, fmt)
+        step = self.parse_step(step)
+
+        # Group timestamps by day -> each day is a window
+        windows = defaultdict(list)
+        while initial_date <= end_date:
+            windows[initial_date.strftime('%Y%m%d')].append(initial_date.strftime('%Y%m%d%H%M'))
+            initial_date += step
+
+        os.makedirs(out_dir, exist_ok=True)
+        start = time.time()
+        failed = []
+        total_rows = total_dup = 0
+
+        with tracer.span('API_Request.request_api_range_marine', step=str(step), stn=stn or '') as span, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            # timestamps are submitted in order, at most workers * 4 in flight at once
+            # -> memory is bounded by the open days, not by the length of the range
+            # copy_context -> spans in worker threads stay under this span
+            # source='range' -> archived responses are re-parsed into per-day partitions
+            pending = ((day, tm) for day, tms in windows.items() for tm in tms)
+            window = workers * 4
+            futures = {}
+
+            def submit(n):
+                for day, tm in islice(pending, n):
+                    futures[pool.submit(contextvars.copy_context().run, self.fetch_marine, tm, stn,
+                                        source='range')] = (day, tm)
+
+            submit(window)
+            print(f'[Fetching] {sum(map(len, windows.values()))} timestamps of {len(windows)} days initiated . . .')
+
+            # a day is saved once all of its timestamps are done
+            remaining = {day: len(tms) for day, tms in windows.items()}
+            frames = defaultdict(list)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    day, tm = futures.pop(future)
+                    try:
+                        df = future.result()
+                        if not df.empty:
+                            frames[day].append((tm, df))
+                    except Exception as e:
+                        failed.append(tm)
+                        print(f'Request Fail at {tm} : {self.hide_key(e)}')
+
+                    remaining[day] -= 1
+                    if remaining[day]:
+                        continue
+
+                    # completed day -> frames are released once saved
+                    day_frames = frames.pop(day, [])
+                    if not day_frames:
+                        continue
+                    # order of completion is random -> sorted by tm so that the result is always the same
+                    day_frames = [df for tm, df in sorted(day_frames, key=lambda item: item[0])]
+                    rows, dup = self.save_marine_day(day, day_frames, out_dir)
+                    total_rows += rows
+                    total_dup += dup
+                    print(f'Saved {day} : {rows} rows ({dup} duplicated removed)')
+                submit(len(done))
+
+            span.add('rows', total_rows)
+            span.set(duplicates=total_dup, failed=len(failed))
+
+        elapse = time.time() - start
+        print(f'Total Run time : {elapse: .2f} sec')
+        if failed:
+            print(f'Failed timestamps ({len(failed)}) : {sorted(failed)}')
+
+        return {'rows': total_rows, 'duplicates': total_dup, 'failed': sorted(failed)}
     
 
 
@@ -334,20 +761,25 @@ class API_Request:
 
 
 
-    def __init__(self):
+    def __init__(self, base_url=None):
         # Get API_key from .env
         load_dotenv()
         self.api_key = os.getenv('API_KEY')
+
+        # Base URL of API -> point KMA_BASE_URL at mock_kma_server for offline test
+        self.base_url = base_url or os.getenv('KMA_BASE_URL', 'https://apihub.kma.go.kr/api/typ01/url/')
+        if not self.base_url.endswith('/'):
+            self.base_url += '/'
+
+        # Per thread storage -> requests.Session of each worker
+        self.local = threading.local()
+
+        # Every raw response is kept -> parser / schema change is re-parsed without request
+        self.archive = raw_archive()
         
 
-        # # Run to get continent data csv
-        # # To see stn_info for weather already exist
-        # weather_stn = True if os.path.exists(os.path.join(
-        #     os.getenv('FILES_PATH_STN'), 'stn_SFC_info.csv')) else False
-        # if not weather_stn:
-        #     self.request_api_location(inf='SFC')
-        # else:
-        #     print('File already in path')
+        # # Run to get station info csv -> refetched only after TTL, rewritten only if changed
+        # self.refresh_locations(['SFC', 'BUOY'])
         # # Run to get weather api
         # self.request_api_loop('2015-01-01','2025-10-25')
 
@@ -358,4 +790,5 @@ class API_Request:
 
 if __name__ == "__main__":
     pd.set_option('future.no_silent_downcasting', True)
-    api_request = API_Request()
\ No newline at end of file
+    api_request = API_Request()
+    tracer.finish()
\ No newline at end of file
@@ -0,0 +1,366 @@
+import os, sys, json, time, shutil, argparse, platform, statistics, subprocess, tempfile
+import contextlib
+import pandas as pd
+from datetime import datetime
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+
+import kma_response
+from API_request import API_Request
+from csv_merge import csv_merge
+from load_into_s3 import load_into_s3
+from schema_registry import SCHEMAS
+from snowflake_controller import snowflake_controller
+
+
+class local_s3_client:
+    '''
+        Local stand-in of boto3 S3 client -> objects are kept as files in a folder
+        Only the calls used by load_into_s3.load are implemented
+    '''
+
+    def __init__(self, root):
+        self.root = root
+
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        return {'ContentLength': os.path.getsize(path), 'ResponseMetadata': {'RetryAttempts': 0}}
+
+
+    def delete_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+    def upload_file(self, Filename, Bucket, Key):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(Filename, path)
+
+
+def local_analytics(merged_path, stn_path):
+    '''
+        Pandas version of surface_kor_daily_analytics + surface_kor_annualy_temperature
+        Returns the annual temperature table
+
+        param :
+            merged_path : merged_SFC.csv
+            stn_path : stn_SFC_info.csv
+    '''
+    surface = SCHEMAS['SFC'].read_csv(merged_path, usecols=['TM', 'STN', 'TA_AVG', 'TA_MAX', 'TA_MIN', 'HM_AVG', 'RN_D99'])
+    station = SCHEMAS['stn_SFC'].read_csv(stn_path, usecols=['STN_ID', 'STN_KO', 'LON_degee', 'LAT_degree'], encoding='utf-8-sig')
+
+    # daily analytics : surface LEFT JOIN station
+    daily = surface.merge(station, how='left', left_on='STN', right_on='STN_ID').sort_values('TM')
+
+    # annual temperature
+    valid = daily[(daily['TA_MAX'] >= -20) & (daily['TA_AVG'] >= -20) & (daily['TA_MIN'] >= -20)]
+    year = (valid['TM'] // 10000).rename('year')
+    annual = valid.groupby(year)[['TA_MAX', 'TA_AVG', 'TA_MIN']].mean()
+    diff = annual.diff().fillna(0).round(2).add_suffix('_DIFF')
+    return pd.concat([annual.round(2), diff], axis=1).reset_index()
+
+
+class benchmark:
+    '''
+        Benchmark suite over the bundled data/ corpus
+        Times response parsing, csv_merge.merge (full, incremental), S3 upload against
+        a local stand-in and local analytics (pandas, DuckDB) -> results saved as JSON for comparison
+    '''
+
+    def __init__(self, limit=365, repeat=3, incremental_days=7):
+        load_dotenv()
+        self.weather_dir = os.getenv('FILES_PATH_weather', 'data/weather_condition')
+        self.marine_dir = os.getenv('FILES_PATH_marine', 'data/marine_condition')
+        self.raw_dir = os.getenv('RAW_FIXTURE_DIR', 'data/raw_responses')
+        self.out_dir = os.getenv('BENCH_DIR', 'data/bench')
+
+        self.limit = limit
+        self.repeat = repeat
+        self.incremental_days = incremental_days
+        self.work_dir = tempfile.mkdtemp(prefix='bench_')
+        self.api = API_Request()
+        self.results = []
+
+
+    def corpus(self, path):
+        '''
+            Daily csv files used as fixtures (latest {limit} files, all if limit is 0)
+        '''
+        files = sorted(file for file in os.listdir(path) if file.endswith('.csv'))
+        return files[-self.limit:] if self.limit else files
+
+
+    def raw_fixtures(self, kind, path):
+        '''
+            Raw API responses for parsing benchmark
+            Captured responses in RAW_FIXTURE_DIR/{kind}/*.txt are used if exist,
+            else responses are rendered from the stored daily files
+        '''
+        captured = os.path.join(self.raw_dir, kind)
+        if os.path.isdir(captured) and os.listdir(captured):
+            texts = []
+            for file in sorted(os.listdir(captured)):
+                with open(os.path.join(captured, file), encoding='utf-8') as f:
+                    texts.append(f.read())
+            return texts
+
+        meta_path = os.path.join(path, f'{kind}_meta.txt')
+        render = kma_response.render_weather if kind == 'weather' else kma_response.render_marine
+        return [render(kma_response.read_raw_csv(os.path.join(path, file)), meta_path)
+                for file in self.corpus(path)]
+
+
+    def link_corpus(self, src, files):
+        '''
+            Make a folder having only the given files (symlink, copy if not supported)
+        '''
+        dst = tempfile.mkdtemp(dir=self.work_dir)
+        for file in files:
+            try:
+                os.symlink(os.path.abspath(os.path.join(src, file)), os.path.join(dst, file))
+            except OSError:
+                shutil.copy(os.path.join(src, file), dst)
+        return dst
+
+
+    def time_case(self, name, func, setup=None, items=None, nbytes=None):
+        '''
+            Run func {repeat} times and record wall time of each run
+            setup is called before each run and is not timed
+
+            param :
+                name : name of the case
+                func : timed function
+                setup : untimed function before each run
+                items : number of items (files, rows) processed by one run
+                nbytes : bytes processed by one run
+        '''
+        times = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+
+        median = statistics.median(times)
+        result = {
+            'name': name,
+            'repeat': self.repeat,
+            'min_s': min(times),
+            'median_s': median,
+            'mean_s': statistics.mean(times),
+            'items': items,
+            'bytes': nbytes,
+            'items_per_s': items / median if items and median else None,
+            'mb_per_s': nbytes / median / 1e6 if nbytes and median else None
+        }
+        self.results.append(result)
+        print(f"{name:<28} median {median:8.4f}s  min {min(times):8.4f}s")
+        return result
+
+
+    def bench_parse(self):
+        weather = self.raw_fixtures('weather', self.weather_dir)
+        marine = self.raw_fixtures('marine', self.marine_dir)
+        stn = kma_response.render_location(kma_response.read_raw_csv('data/stn_SFC_info.csv'), 'SFC')
+
+        self.time_case('parse_weather', lambda: [self.api.parse_weather(text) for text in weather],
+                       items=len(weather), nbytes=sum(len(text.encode()) for text in weather))
+        self.time_case('parse_marine', lambda: [self.api.parse_marine(text) for text in marine],
+                       items=len(marine), nbytes=sum(len(text.encode()) for text in marine))
+        self.time_case('parse_location', lambda: self.api.parse_location(stn, 'SFC'),
+                       items=1, nbytes=len(stn.encode()))
+
+
+    def bench_merge(self):
+        merger = csv_merge()
+
+        for type, src in (('SFC', self.weather_dir), ('marine', self.marine_dir)):
+            files = self.corpus(src)
+            nbytes = sum(os.path.getsize(os.path.join(src, file)) for file in files)
+            full_dir = self.link_corpus(src, files)
+            out_path = os.path.join(self.work_dir, f'merged_{type}.csv')
+
+            # corpus files are known good -> merge only is timed (no validation)
+            self.time_case(f'merge_full_{type}',
+                           lambda: merger.merge(full_dir, type, out_path=out_path, validate=False),
+                           items=len(files), nbytes=nbytes)
+
+            # Incremental : merged csv of older files exists -> the last few days are new
+            new_files = files[-self.incremental_days:]
+            base_dir = self.link_corpus(src, files[:-self.incremental_days])
+            base_out = os.path.join(self.work_dir, f'base_{type}.csv')
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                merger.merge(base_dir, type, out_path=base_out, validate=False)
+
+            inc_out = os.path.join(self.work_dir, f'incremental_{type}.csv')
+            def restore(base_out=base_out, inc_out=inc_out):
+                shutil.copyfile(base_out, inc_out)
+                for ext in ('.manifest', '.keys.npy'):
+                    shutil.copyfile(os.path.splitext(base_out)[0] + ext, os.path.splitext(inc_out)[0] + ext)
+
+            self.time_case(f'merge_incremental_{type}',
+                           lambda: merger.merge(full_dir, type, incremental=True, out_path=inc_out,
+                                                validate=False),
+                           setup=restore, items=len(new_files),
+                           nbytes=sum(os.path.getsize(os.path.join(src, file)) for file in new_files))
+
+
+    def bench_upload(self):
+        files = {
+            os.path.join(self.work_dir, 'merged_SFC.csv'): 'raw/merged_SFC.csv',
+            os.path.join(self.work_dir, 'merged_marine.csv'): 'raw/merged_marine.csv',
+            'data/stn_SFC_info.csv': 'raw/stn_SFC_info.csv',
+            'data/stn_BUOY_info.csv': 'raw/stn_BUOY_info.csv'
+        }
+        nbytes = sum(os.path.getsize(path) for path in files)
+
+        loader = load_into_s3.__new__(load_into_s3)
+        loader.bucket = 'bench'
+        client = local_s3_client(os.path.join(self.work_dir, 's3'))
+
+        def empty_bucket():
+            shutil.rmtree(client.root, ignore_errors=True)
+
+        def upload():
+            for path, key in files.items():
+                loader.load(client, path, key)
+
+        self.time_case('upload_s3_local', upload, setup=empty_bucket, items=len(files), nbytes=nbytes)
+        self.time_case('upload_s3_local_skip', upload, items=len(files))
+
+
+    def bench_analytics(self):
+        merged_path = os.path.join(self.work_dir, 'merged_SFC.csv')
+        self.time_case('analytics_local', lambda: local_analytics(merged_path, 'data/stn_SFC_info.csv'),
+                       nbytes=os.path.getsize(merged_path))
+
+        # Same command_map steps as Snowflake on embedded DuckDB (load + ELT)
+        try:
+            import duckdb
+        except ImportError:
+            print('duckdb is not installed -> skip analytics_duckdb')
+            return
+
+        shutil.copy('data/stn_SFC_info.csv', self.work_dir)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            controller = snowflake_controller('duckdb', interactive=False)
+        controller.backend.data_dir = self.work_dir
+        steps = ['station_surface_kor', 'surface_kor', 'surface_kor_daily_analytics', 'surface_kor_annualy_temperature']
+
+        self.time_case('analytics_duckdb', lambda: [controller.command_map[step]() for step in steps],
+                       nbytes=os.path.getsize(merged_path))
+        controller.backend.close()
+
+
+    def run(self):
+        '''
+            Run every case (merge before upload / analytics -> they use merged output)
+        '''
+        try:
+            self.bench_parse()
+            self.bench_merge()
+            self.bench_upload()
+            self.bench_analytics()
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        return self.results
+
+
+    def save(self, path=None):
+        '''
+            Save results with environment info as JSON
+            param :
+                path : target file, if None -> BENCH_DIR/bench_{datetime}.json
+        '''
+        if path is None:
+            os.makedirs(self.out_dir, exist_ok=True)
+            path = os.path.join(self.out_dir, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                    capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = ''
+
+        payload = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'limit': self.limit,
+            'repeat': self.repeat,
+            'results': self.results
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=1)
+        print(f'Benchmark saved : {path}')
+        return path
+
+
+def compare(current, baseline, threshold=0.10):
+    '''
+        Compare median time of 2 benchmark results
+        Returns the list of regressed case names (slower than baseline by more than threshold)
+
+        param :
+            current : result JSON path (or loaded dict)
+            baseline : result JSON path (or loaded dict)
+            threshold : allowed slow down ratio (0.10 -> 10 %)
+    '''
+    def load(result):
+        if isinstance(result, dict):
+            return result
+        with open(result, encoding='utf-8') as f:
+            return json.load(f)
+
+    current, baseline = load(current), load(baseline)
+    base = {row['name']: row for row in baseline['results']}
+    regressions = []
+
+    print(f"{'CASE':<28} {'BASE(s)':>9} {'NOW(s)':>9} {'CHANGE':>8}")
+    for row in current['results']:
+        if row['name'] not in base:
+            print(f"{row['name']:<28} {'-':>9} {row['median_s']:>9.4f} {'new':>8}")
+            continue
+        before = base[row['name']]['median_s']
+        change = (row['median_s'] - before) / before if before else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(row['name'])
+            flag = '  <- REGRESSION'
+        print(f"{row['name']:<28} {before:>9.4f} {row['median_s']:>9.4f} {change:>+8.1%}{flag}")
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark over the bundled data/ corpus')
+    parser.add_argument('--limit', type=int, default=365, help='number of latest daily files (0 -> all)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default=None, help='result JSON path')
+    parser.add_argument('--compare', default=None, help='baseline result JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slow down ratio')
+    args = parser.parse_args()
+
+    bench = benchmark(limit=args.limit, repeat=args.repeat)
+    bench.run()
+    path = bench.save(args.out)
+
+    if args.compare:
+        regressions = compare(path, args.compare, args.threshold)
+        if regressions:
+            print(f'Regression detected : {regressions}')
+            sys.exit(1)
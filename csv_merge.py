@@ -1,45 +1,219 @@
 import pandas as pd
+import numpy as np
 import os
 from dotenv import load_dotenv
+from tracing import tracer
+from schema_registry import get_schema
+from key_index import key_index
+from data_validator import data_validator
 
 
 class csv_merge:
-    def merge(self, path, type):
+    def rewrite(self, csv_path, columns, hashes, new_rows):
         '''
-            Merge all the csv file in the path then create a csv file 
+            Replace the rows of given key hashes by new rows (last write wins)
+            Merged csv is streamed in chunks into a temp file without the replaced rows,
+            new rows are appended to the temp file, then it replaces merged csv
+            -> O(merged csv), so it is only run when a new key is already merged
+            -> a stop in the middle leaves merged csv as it was
+            Values are read as string -> the other rows are written back as they were
+
+            param :
+                csv_path : merged csv
+                columns : key columns
+                hashes : key hashes to remove
+                new_rows : rows appended after the kept rows
+            Returns number of removed rows
+        '''
+        header = pd.read_csv(csv_path, nrows=0).columns
+        tmp_path = csv_path + '.tmp'
+        removed = 0
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                pd.DataFrame(columns=header).to_csv(f, index=False)
+                for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=500_000):
+                    drop = np.isin(key_index.hash_keys(chunk, columns), hashes)
+                    removed += int(drop.sum())
+                    chunk[~drop].to_csv(f, header=False, index=False)
+                new_rows.reindex(columns=header).to_csv(f, header=False, index=False)
+            os.replace(tmp_path, csv_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return removed
+
+
+    def append(self, csv_path, new_rows):
+        '''
+            Append new rows at the end of merged csv (column order of merged csv)
+            If writing fails, the file is cut back to its size before -> no partial row
+        '''
+        header = pd.read_csv(csv_path, nrows=0).columns
+        size = os.path.getsize(csv_path)
+        try:
+            with open(csv_path, 'a', encoding='utf-8', newline='') as f:
+                new_rows.reindex(columns=header).to_csv(f, header=False, index=False)
+        except BaseException:
+            os.truncate(csv_path, size)
+            raise
 
-            param
-                path : the path of folder having csv files
+
+    def dedup(self, df, columns, policy, index, append):
         '''
+            Remove duplicated keys -> inside new rows and against rows already merged
+            The rows already merged are found by key index (merged csv is not read here)
+
+            param :
+                df : new rows
+                columns : key columns (ex - TM, STN)
+                policy : 'last' -> last write wins (old row replaced by new row)
+                         'first' -> keep first (new row of existing key dropped)
+                index : key_index of merged csv
+                append : True if rows are appended to existing merged csv
+            Returns (deduplicated rows, number of dropped rows,
+                     hashes of merged rows to be replaced -> rewrite() if any)
+        '''
+        hashes = key_index.hash_keys(df, columns)
 
-        # put all csv file into a list
-        csv_files = [file for file in os.listdir(path) if file.endswith('.csv')]
+        # duplicated inside new rows -> files are sorted, so later file is 'last'
+        in_batch = pd.Series(hashes).duplicated(keep=policy).to_numpy()
+        df, hashes = df[~in_batch], hashes[~in_batch]
+        dropped = int(in_batch.sum())
 
-        # put all csv files into lists separated
-        df_lists = []
+        replaced = np.empty(0, dtype=np.uint64)
+        if append:
+            seen = index.contains(hashes)
+            if seen.any():
+                if policy == 'first':
+                    df, hashes = df[~seen], hashes[~seen]
+                    dropped += int(seen.sum())
+                else:
+                    replaced = hashes[seen]
 
-        # Read csv and append at list
-        for file in csv_files:
-            file_path = os.path.join(path, file)
-            df = pd.read_csv(file_path)
-            df_lists.append(df)
-            print('-------------------- working --------------------')
-            
+        index.add(hashes)
+        return df, dropped, replaced
 
-        # merge all csv files in the list
-        merged_df = pd.concat(df_lists, ignore_index=True)
 
-        # Cleaning DF if type is marine
-        if type.lower() == 'marine':
-            print('Processing Marine Dataset..')
-            merged_df["TM_KST"] = merged_df["TM_KST"].astype(str).str[:8]
+    def merge(self, path, type, incremental=False, out_path=None, policy='last', validate=True):
+        '''
+            Merge all the csv file in the path then create a csv file 
+            The merged file names are kept in a manifest (merged_{type}.manifest)
+            Rows with same key (ex - TM, STN) are deduplicated by policy,
+            the keys are kept in merged_{type}.keys.npy for next incremental run
 
-        merged_df.fillna('', inplace=True)
-        # create merged data.csv
-        merged_df.to_csv(f'data/merged_{type}.csv', index=False, encoding='utf-8')
+            param
+                path : the path of folder having csv files
+                type : the name of dataset (SFC, marine)
+                incremental : if True and merged csv exists -> only files not in manifest
+                    are read and appended at the end of merged csv
+                out_path : target csv, if None -> data/merged_{type}.csv
+                policy : 'last' -> last write wins, 'first' -> keep first
+                validate : if True -> files to be merged are validated first,
+                    failed files are moved into quarantine and not merged
+        '''
 
-        # Debug : to see merged csv
-        print(f'Merged datasets completed!\n{merged_df.head(5)}')
+        out_path = out_path if out_path else f'data/merged_{type}.csv'
+        manifest_path = os.path.splitext(out_path)[0] + '.manifest'
+        index_path = os.path.splitext(out_path)[0] + '.keys.npy'
+        if policy not in ('first', 'last'):
+            raise ValueError(f"policy must be 'first' or 'last' : {policy}")
+
+        with tracer.span('csv_merge.merge', type=type, incremental=incremental) as span:
+            # put all csv file into a list
+            csv_files = sorted(file for file in os.listdir(path) if file.endswith('.csv'))
+
+            # Incremental -> skip the files already merged
+            append = incremental and os.path.exists(out_path) and os.path.exists(manifest_path)
+            if append:
+                with open(manifest_path, encoding='utf-8') as f:
+                    merged_files = set(f.read().split())
+                csv_files = [file for file in csv_files if file not in merged_files]
+
+                if not csv_files:
+                    print('No new csv file to merge')
+                    return 0
+
+            # Explicit dtypes from schema registry -> all files are parsed by one read_csv
+            schema = get_schema(type)
+            file_paths = [os.path.join(path, file) for file in csv_files]
+
+            # Bad daily file -> quarantined here, so merged csv is never built from it
+            if schema and validate:
+                validator = data_validator()
+                failed = [report for report in validator.validate(file_paths, type) if not report['ok']]
+                for report in failed:
+                    validator.quarantine(report, type)
+                failed = {report['file'] for report in failed}
+                csv_files = [file for file, file_path in zip(csv_files, file_paths) if file_path not in failed]
+                file_paths = [file_path for file_path in file_paths if file_path not in failed]
+                span.set(quarantined=len(failed))
+
+                if not csv_files:
+                    print('No valid csv file to merge')
+                    return 0
+            span.add('bytes_in', sum(os.path.getsize(file_path) for file_path in file_paths))
+
+            if schema:
+                print(f'-------------------- working : {len(file_paths)} files --------------------')
+                merged_df = schema.read_many(file_paths)
+            else:
+                # put all csv files into lists separated
+                df_lists = []
+
+                # Read csv and append at list
+                for file_path in file_paths:
+                    df = pd.read_csv(file_path)
+                    df_lists.append(df)
+                    print('-------------------- working --------------------')
+
+                # merge all csv files in the list
+                merged_df = pd.concat(df_lists, ignore_index=True)
+
+            # Cleaning DF if type is marine
+            if type.lower() == 'marine':
+                print('Processing Marine Dataset..')
+                merged_df["TM_KST"] = merged_df["TM_KST"].astype(str).str[:8]
+
+            # Deduplicate by key of schema
+            dropped = 0
+            replaced = []
+            if schema:
+                if append:
+                    index = key_index(index_path) if os.path.exists(index_path) \
+                        else key_index.from_csv(out_path, schema.key, index_path)
+                else:
+                    index = key_index(None)
+                    index.path = index_path
+                merged_df, dropped, replaced = self.dedup(merged_df, schema.key, policy, index, append)
+
+            # missing value (NaN) is written as '' by to_csv -> no fillna on typed columns
+            size_before = os.path.getsize(out_path) if append else 0
+            if append and len(replaced):
+                # last write wins on merged keys -> old rows removed and new rows added in one swap
+                dropped += self.rewrite(out_path, schema.key, replaced, merged_df)
+            elif append:
+                self.append(out_path, merged_df)
+            else:
+                # create merged data.csv (temp file then replace)
+                merged_df.to_csv(out_path + '.tmp', index=False, encoding='utf-8')
+                os.replace(out_path + '.tmp', out_path)
+            span.add('rows', len(merged_df))
+            span.add('bytes_out', max(os.path.getsize(out_path) - size_before, 0))
+
+            if schema:
+                print(f'Duplicated rows dropped : {dropped} (policy : {policy})')
+                span.set(duplicates=dropped)
+
+            # Record merged files and keys for next incremental run
+            with open(manifest_path, 'a' if append else 'w', encoding='utf-8') as f:
+                f.write('\n'.join(csv_files) + '\n')
+            if schema:
+                index.save()
+
+            # Debug : to see merged csv
+            print(f'Merged datasets completed!\n{merged_df.head(5)}')
+
+            return dropped
 
         
 
@@ -57,4 +231,5 @@ class csv_merge:
 
 
 if __name__ == '__main__':
-    csv_merge()
\ No newline at end of file
+    csv_merge()
+    tracer.finish()
\ No newline at end of file
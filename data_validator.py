@@ -0,0 +1,340 @@
+import os, io, csv, json, shutil, argparse
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from tracing import tracer
+from schema_registry import get_schema
+from warehouse_backend import local_file
+
+
+class data_validator:
+    '''
+        Vectorized check of csv files before they are merged / uploaded into S3
+        All files of a batch are parsed by one read_csv and every check is done
+        on whole columns at once, then counted per file
+
+        Checks :
+            column count : every line has the number of fields of the schema
+            dtype : value can be read as the schema dtype (int64 columns can not be empty)
+            range : value (not sentinel) inside valid_range of column
+            coverage : stations of each day compared with the usual number of stations,
+                taken from outside the batch (see expected_stations)
+        A daily file failing the check is moved into the quarantine folder with its report
+        (before it is merged); merged / station files are only reported, never moved
+
+        param :
+            quarantine_dir : folder of quarantined files (QUARANTINE_DIR in .env, default data/quarantine)
+            max_bad_ratio : max ratio of rows having out of range value (VALIDATE_MAX_BAD_RATIO, default 0.05)
+            min_coverage : min ratio of stations of a day to the usual number of stations
+                (VALIDATE_MIN_COVERAGE, default 0.5)
+            baseline_days : stored daily files used for the usual number of stations
+                (VALIDATE_BASELINE_DAYS, default 30)
+    '''
+
+    # dataset -> station list having all of its stations
+    # (marine stations are not all in stn_BUOY -> stored days only)
+    STATION_LISTS = {'SFC': 'stn_SFC'}
+
+
+    def __init__(self, quarantine_dir=None, max_bad_ratio=None, min_coverage=None, baseline_days=None):
+        load_dotenv()
+        self.quarantine_dir = quarantine_dir or os.getenv('QUARANTINE_DIR', 'data/quarantine')
+        self.max_bad_ratio = float(max_bad_ratio if max_bad_ratio is not None
+                                   else os.getenv('VALIDATE_MAX_BAD_RATIO', 0.05))
+        self.min_coverage = float(min_coverage if min_coverage is not None
+                                  else os.getenv('VALIDATE_MIN_COVERAGE', 0.5))
+        self.baseline_days = int(baseline_days if baseline_days is not None
+                                 else os.getenv('VALIDATE_BASELINE_DAYS', 30))
+
+
+    def read_files(self, schema, paths, reports):
+        '''
+            Check header and field count of every line, then read the good files as text
+            Fields are counted with numpy on the raw bytes -> no line loop in python
+            (file having quoted fields -> counted by csv reader, ',' inside quotes is not a field)
+
+            param :
+                schema : dataset_schema of files
+                paths : the paths of csv files
+                reports : report of each file (errors are added here)
+            Returns (joined rows of good files, file index of each row)
+        '''
+        expected = ','.join(schema.names)
+        n_fields = len(schema.names)
+        chunks, chunk_files, chunk_lines = [], [], []
+
+        for i, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                header = f.readline().decode('utf-8-sig').strip()
+                body = f.read().replace(b'\r\n', b'\n')
+
+            if header != expected:
+                reports[i]['errors'].append('header does not match schema')
+                continue
+            if not body.strip():
+                reports[i]['errors'].append('no data row')
+                continue
+            if not body.endswith(b'\n'):
+                body += b'\n'
+
+            if b'"' in body:
+                # quoted field may hold ',' or newline -> fields counted by csv reader
+                rows = csv.reader(io.StringIO(body.decode('utf-8'), newline=''))
+                fields = np.array([len(row) for row in rows], dtype=np.int64)
+            else:
+                # fields of each line = commas between two newlines + 1
+                arr = np.frombuffer(body, dtype=np.uint8)
+                newlines = np.flatnonzero(arr == ord('\n'))
+                commas = np.cumsum(arr == ord(','))[newlines]
+                fields = np.diff(commas, prepend=0) + 1
+
+            bad_lines = int((fields != n_fields).sum())
+            reports[i]['rows'] = len(fields)
+            if bad_lines:
+                reports[i]['errors'].append(f'{bad_lines} lines with wrong number of columns')
+                continue
+
+            chunks.append(body)
+            chunk_files.append(i)
+            chunk_lines.append(len(fields))
+
+        return b''.join(chunks), np.repeat(chunk_files, chunk_lines).astype(np.int64)
+
+
+    def parse(self, schema, data):
+        '''
+            Read the joined rows -> numeric columns as float64 by the C parser
+            (int columns too, so that empty or decimal values can be found)
+            If some value is not a number, the parse fails -> read as text and
+            coerce each column to find the rows (slow path, only for bad batch)
+
+            Returns (data frame, mask of rows not matching dtype for each numeric column)
+        '''
+        numeric = [col for col in schema.columns if col.dtype != 'str']
+        wrong = {}
+        if not data:
+            return schema.empty_frame(), wrong
+
+        try:
+            dtype = {col.name: 'str' if col.dtype == 'str' else 'float64' for col in schema.columns}
+            df = pd.read_csv(io.BytesIO(data), header=None, names=schema.names, dtype=dtype,
+                             keep_default_na=False, na_values=[''])
+        except ValueError:
+            df = pd.read_csv(io.BytesIO(data), header=None, names=schema.names, dtype=str,
+                             keep_default_na=False)
+            for col in numeric:
+                value = pd.to_numeric(df[col.name], errors='coerce')
+                wrong[col.name] = (value.isna() & (df[col.name] != '')).to_numpy()
+                df[col.name] = value.astype('float64')
+
+        # int column -> empty or decimal value can not be loaded as int64
+        for col in numeric:
+            mask = wrong.get(col.name, np.zeros(len(df), dtype=bool))
+            if col.dtype == 'int64':
+                value = df[col.name].to_numpy(dtype='float64')
+                mask = mask | np.isnan(value) | (value % 1 != 0)
+            wrong[col.name] = mask
+        return df, wrong
+
+
+    def check_values(self, schema, df, wrong, file_idx, reports):
+        '''
+            dtype and range check of all numeric columns -> counted per file
+        '''
+        n_files = len(reports)
+        bad_type = np.zeros(len(df), dtype=bool)
+        out_range = np.zeros(len(df), dtype=bool)
+        bad_columns = [[] for _ in reports]
+
+        for col in schema.columns:
+            if col.name not in wrong:
+                continue
+            if wrong[col.name].any():
+                for i in np.unique(file_idx[wrong[col.name]]):
+                    bad_columns[i].append(col.name)
+            bad_type |= wrong[col.name]
+
+            if col.valid_range:
+                low, high = col.valid_range
+                value = df[col.name].to_numpy(dtype='float64')
+                observed = ~np.isnan(value)
+                if col.sentinel is not None:
+                    observed &= value != col.sentinel
+                out_range |= observed & ((value < low) | (value > high))
+
+        type_count = np.bincount(file_idx, weights=bad_type, minlength=n_files)
+        range_count = np.bincount(file_idx, weights=out_range, minlength=n_files)
+
+        for i, report in enumerate(reports):
+            if type_count[i]:
+                report['errors'].append(f'{int(type_count[i])} rows not matching dtype '
+                                        f'({", ".join(bad_columns[i])})')
+            report['out_of_range'] = int(range_count[i])
+            if report['rows'] and range_count[i] / report['rows'] > self.max_bad_ratio:
+                report['errors'].append(f'{int(range_count[i])} rows out of valid range '
+                                        f'(> {self.max_bad_ratio:.0%})')
+
+
+    def stations_per_day(self, schema, df, file_idx):
+        '''
+            Number of stations of each (file, day)
+        '''
+        date_col = schema.date_column
+        station_col = [name for name in schema.key if name != date_col][0]
+        # yyyymmdd or yyyymmddhhmm -> day
+        day = df[date_col].to_numpy(dtype='float64')
+        day = np.where(day >= 1e11, day // 10000, day)
+        days = pd.DataFrame({'file': file_idx, 'day': day,
+                             'stn': df[station_col].to_numpy()})
+        return days.dropna().drop_duplicates().groupby(['file', 'day']).size()
+
+
+    def expected_stations(self, schema, paths):
+        '''
+            Usual number of stations per day, taken from outside the batch
+                1. median of the latest baseline_days daily files stored next to the batch
+                   (files named by date only, not in the batch) -> rolling median
+                2. number of stations in the station list (stn_{type}_info.csv)
+            None if neither exists -> median of the batch is used
+            (only meaningful for a batch of many days, ex - whole folder or merged csv)
+        '''
+        batch = {os.path.abspath(path) for path in paths}
+        folders = {os.path.dirname(path) or '.' for path in paths}
+        stored = []
+        for folder in folders:
+            stored += [os.path.join(folder, file) for file in os.listdir(folder)
+                       if file.endswith('.csv') and file[:-4].isdigit()
+                       and os.path.abspath(os.path.join(folder, file)) not in batch]
+        stored = sorted(stored, key=os.path.basename)[-self.baseline_days:]
+
+        if stored:
+            try:
+                df = pd.concat([schema.read_csv(path, usecols=schema.key, encoding='utf-8-sig')
+                                for path in stored], ignore_index=True)
+                file_idx = np.zeros(len(df), dtype=np.int64)
+                per_day = self.stations_per_day(schema, df, file_idx)
+                if len(per_day):
+                    return float(per_day.median())
+            except ValueError:
+                pass
+
+        station_list = get_schema(self.STATION_LISTS.get(schema.name))
+        if station_list is not None and os.path.exists(local_file(station_list)):
+            with open(local_file(station_list), encoding='utf-8-sig') as f:
+                return float(sum(1 for line in f if line.strip()) - 1)
+        return None
+
+
+    def check_coverage(self, schema, df, file_idx, reports, expected=None):
+        '''
+            Stations of each day compared with the usual number of stations
+            param :
+                expected : usual number of stations per day (None -> median of the batch)
+        '''
+        if schema.date_column is None or df.empty:
+            return
+
+        per_day = self.stations_per_day(schema, df, file_idx)
+        expected = expected if expected else float(per_day.median())
+
+        coverage = (per_day / expected).groupby(level='file').min()
+        for i, ratio in coverage.items():
+            reports[i]['coverage'] = round(float(ratio), 3)
+            if ratio < self.min_coverage:
+                low_days = per_day.loc[i][per_day.loc[i] / expected < self.min_coverage]
+                reports[i]['errors'].append(f'{len(low_days)} days below {self.min_coverage:.0%} of '
+                                            f'{expected:g} stations (ex - {low_days.index[0]:.0f})')
+
+
+    def validate(self, paths, type, expected_stations=None):
+        '''
+            Validate csv files of a dataset
+
+            param :
+                paths : the paths of csv files
+                type : dataset name of schema_registry (SFC, marine, stn_SFC, stn_BUOY)
+                expected_stations : usual number of stations per day (None -> expected_stations())
+            Returns report of each file (dict of file, rows, errors, out_of_range, coverage, ok)
+        '''
+        schema = get_schema(type)
+        if schema is None:
+            raise ValueError(f'No schema registered for {type}')
+
+        with tracer.span('data_validator.validate', type=type, files=len(paths)) as span:
+            reports = [{'file': path, 'rows': 0, 'errors': [], 'out_of_range': 0, 'coverage': None}
+                       for path in paths]
+            span.add('bytes_in', sum(os.path.getsize(path) for path in paths))
+
+            data, file_idx = self.read_files(schema, paths, reports)
+            df, wrong = self.parse(schema, data)
+            self.check_values(schema, df, wrong, file_idx, reports)
+            if expected_stations is None and schema.date_column and paths:
+                expected_stations = self.expected_stations(schema, paths)
+            self.check_coverage(schema, df, file_idx, reports, expected_stations)
+
+            for report in reports:
+                report['ok'] = not report['errors']
+            span.add('rows', len(df))
+            span.set(failed=sum(not report['ok'] for report in reports))
+            return reports
+
+
+    def quarantine(self, report, type):
+        '''
+            Move failed file into quarantine_dir/{type}/ with its report ({file}.json)
+        '''
+        target_dir = os.path.join(self.quarantine_dir, type)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(report['file']))
+
+        shutil.move(report['file'], target)
+        with open(target + '.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'{os.path.basename(target)} : quarantined -> {"; ".join(report["errors"])}')
+        return target
+
+
+    def validate_dir(self, path, type, quarantine=True):
+        '''
+            Validate all csv files in the folder (daily files from API_request)
+            param :
+                path : the path of folder having csv files
+                type : dataset name (SFC, marine)
+                quarantine : if True -> failed files are moved into quarantine
+        '''
+        paths = [os.path.join(path, file) for file in sorted(os.listdir(path)) if file.endswith('.csv')]
+        reports = self.validate(paths, type)
+
+        failed = [report for report in reports if not report['ok']]
+        if quarantine:
+            for report in failed:
+                self.quarantine(report, type)
+        print(f'{type} : {len(reports) - len(failed)} / {len(reports)} files passed validation')
+        return reports
+
+
+    def check(self, path, type):
+        '''
+            Validate one merged / station file before it is uploaded
+            The file is never moved (merge manifest and key index point at it),
+            the reason is printed and upload is blocked by the caller
+            Returns True if the file can be loaded
+        '''
+        report = self.validate([path], type)[0]
+        if not report['ok']:
+            print(f'{os.path.basename(path)} : failed validation -> {"; ".join(report["errors"])}')
+        return report['ok']
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Validate daily csv files and quarantine bad files')
+    parser.add_argument('--dry-run', action='store_true', help='report only, no file is moved')
+    args = parser.parse_args()
+
+    validator = data_validator()
+    validator.validate_dir(os.getenv('FILES_PATH_weather', 'data/weather_condition'), 'SFC',
+                           quarantine=not args.dry_run)
+    validator.validate_dir(os.getenv('FILES_PATH_marine', 'data/marine_condition'), 'marine',
+                           quarantine=not args.dry_run)
+    tracer.finish()
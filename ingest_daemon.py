@@ -0,0 +1,546 @@
+import os, json, time, signal, argparse, threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+import pandas as pd
+
+from tracing import tracer
+from API_request import API_Request
+from csv_merge import csv_merge
+from data_validator import data_validator
+from load_into_s3 import load_into_s3
+from schema_registry import SCHEMAS
+from warehouse_backend import get_backend, local_file, is_direct_load
+
+
+KST = timezone(timedelta(hours=9))
+
+
+class metrics_handler(BaseHTTPRequestHandler):
+    '''
+        GET /metrics -> metrics of daemon as JSON
+    '''
+
+    def log_message(self, format, *args):
+        pass
+
+
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps(self.server.ingest.snapshot(), ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ingest_daemon:
+    '''
+        Long running ingestion of the latest KMA observations
+        Every cycle :
+            1. polls the days (SFC) and timestamps (marine) after the latest daily file
+            2. fetches only those, saves each as a daily file (temp file then replace)
+            3. validates the new files (bad files -> quarantine, timestamp marked bad)
+            4. appends them into the merged csv (csv_merge incremental)
+            5. refreshes station info (after its TTL, rewritten only if the list changed)
+               and loads the changed station tables into the warehouse again
+            6. uploads the changed merged files into S3 at most once per upload_interval
+        A bad timestamp is skipped and fetched again after a backoff
+        (BAD_RETRY in .env, default 3600s, doubled on every failure up to a day),
+        the bad timestamps are kept in INGEST_STATE_PATH -> same after restart
+        Lag / throughput metrics are written into METRICS_PATH every cycle
+        (and served at /metrics if metrics_port is given)
+        SIGINT / SIGTERM stop the daemon after the running step -> no partial file
+
+        param :
+            interval : seconds between polls (POLL_INTERVAL in .env, default 600)
+            marine_step : interval of marine timestamps (MARINE_STEP in .env, only 1d
+                -> one snapshot per day like data/marine_condition)
+            upload : if False -> S3 upload and station table load are skipped (local run)
+            metrics_port : port of metrics endpoint (None -> no server)
+            upload_interval : min seconds between uploads of a merged csv
+                (UPLOAD_INTERVAL in .env, default 86400) -> the whole file is not sent every cycle
+    '''
+
+    def __init__(self, interval=None, marine_step=None, upload=True, metrics_port=None, upload_interval=None):
+        load_dotenv()
+        self.interval = float(interval if interval is not None else os.getenv('POLL_INTERVAL', 600))
+        self.upload = upload
+        self.upload_interval = float(upload_interval if upload_interval is not None
+                                     else os.getenv('UPLOAD_INTERVAL', 86400))
+        self.bad_retry = float(os.getenv('BAD_RETRY', 3600))
+        self.metrics_path = os.getenv('METRICS_PATH', 'data/daemon_metrics.json')
+        self.state_path = os.getenv('INGEST_STATE_PATH', 'data/ingest_state.json')
+
+        self.api = API_Request()
+        self.marine_step = self.api.parse_step(marine_step or os.getenv('MARINE_STEP', '1d'))
+        # merged marine csv is keyed on (day, station) -> a sub-daily snapshot would replace
+        # the previous one of the day and rewrite the merged file every cycle
+        if self.marine_step != timedelta(days=1):
+            raise ValueError(f'MARINE_STEP must be 1d (merged marine data is daily) : {self.marine_step}')
+        self.merger = csv_merge()
+        self.validator = data_validator()
+        self.stn_infs = [inf for inf in os.getenv('STN_INFS', 'SFC,BUOY').split(',') if inf]
+
+        # dataset -> daily folder, merged csv, length of timestamp in file name
+        self.datasets = {
+            'SFC': {
+                'dir': os.getenv('FILES_PATH_weather', 'data/weather_condition'),
+                'merged': os.getenv('MERGED_FILE_SFC_PATH', 'data/merged_SFC.csv'),
+                'fmt': '%Y%m%d'
+            },
+            'marine': {
+                'dir': os.getenv('FILES_PATH_marine', 'data/marine_condition'),
+                'merged': os.getenv('MERGED_FILE_MARINE_PATH', 'data/merged_marine.csv'),
+                'fmt': '%Y%m%d%H%M'
+            }
+        }
+
+        # bad timestamps (dataset -> tm -> failures, retry_at) and merged files waiting for upload
+        self.bad = {type: {} for type in self.datasets}
+        self.queued = set()
+        self.uploaded = {}
+        self.load_state()
+
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.metrics = {
+            'status': 'starting', 'started': datetime.now(KST).isoformat(timespec='seconds'),
+            'cycles': 0, 'errors': 0, 'last_error': None, 'uploads': 0,
+            **{type: {'latest': None, 'lag_s': None, 'files': 0, 'rows': 0, 'bytes': 0,
+                      'rows_per_s': 0.0, 'quarantined': 0, 'bad': len(self.bad[type])}
+               for type in self.datasets}
+        }
+
+        self.server = None
+        if metrics_port is not None:
+            self.server = ThreadingHTTPServer(('127.0.0.1', metrics_port), metrics_handler)
+            self.server.ingest = self
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            print(f'Metrics served at http://127.0.0.1:{self.server.server_address[1]}/metrics')
+
+
+    def now(self):
+        return datetime.now(KST).replace(tzinfo=None)
+
+
+    def latest(self, type):
+        '''
+            Timestamp of the latest daily file (None if folder is empty)
+        '''
+        dataset = self.datasets[type]
+        length = len(datetime(2000, 1, 1).strftime(dataset['fmt']))
+        stamps = [file[:-4] for file in os.listdir(dataset['dir'])
+                  if file.endswith('.csv') and len(file) == length + 4 and file[:-4].isdigit()]
+        return datetime.strptime(max(stamps), dataset['fmt']) if stamps else None
+
+
+    def pending(self, type):
+        '''
+            Timestamps published after the latest daily file
+                SFC : every day until yesterday (daily data is made after the day ends)
+                marine : every marine_step until now
+            Empty folder -> starts from INGEST_START in .env (default yesterday)
+            Bad timestamps are skipped until their retry time, then fetched first
+        '''
+        now = self.now()
+        latest = self.latest(type)
+        if type == 'SFC':
+            step, last = timedelta(days=1), now - timedelta(days=1)
+        else:
+            step, last = self.marine_step, now
+
+        if latest is None:
+            start = os.getenv('INGEST_START')
+            current = datetime.strptime(start, '%Y%m%d') if start else last.replace(hour=0, minute=0)
+            if type == 'marine' and not start:
+                current = current.replace(hour=14)
+        else:
+            current = latest + step
+
+        bad = self.bad[type]
+        stamps = []
+        while current <= last:
+            tm = current.strftime(self.datasets[type]['fmt'])
+            if tm not in bad:
+                stamps.append(tm)
+            current += step
+
+        due = sorted(tm for tm, entry in bad.items() if entry['retry_at'] <= time.time())
+        return due + stamps
+
+
+    def mark_bad(self, type, tm, errors):
+        '''
+            Timestamp failed validation -> skipped until retry_at (backoff doubled per failure)
+        '''
+        entry = self.bad[type].get(tm, {'failures': 0})
+        entry['failures'] += 1
+        wait = min(self.bad_retry * 2 ** (entry['failures'] - 1), 86400)
+        entry['retry_at'] = time.time() + wait
+        entry['errors'] = errors
+        self.bad[type][tm] = entry
+        print(f'{type} {tm} : marked bad ({entry["failures"]} failures) -> retry in {wait:g}s')
+
+
+    def load_state(self):
+        '''
+            Bad timestamps, queued uploads and upload times of last run (broken file -> start empty)
+        '''
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            for type, bad in state.get('bad', {}).items():
+                if type in self.bad:
+                    self.bad[type] = bad
+            self.queued = set(state.get('queued', []))
+            self.uploaded = dict(state.get('uploaded', {}))
+        except (ValueError, AttributeError) as e:
+            print(f'Ingest state not readable -> started empty ({e})')
+
+
+    def save_state(self):
+        '''
+            Write bad timestamps, queued uploads and upload times into INGEST_STATE_PATH
+            (temp file then replace)
+        '''
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        with open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'bad': self.bad, 'queued': sorted(self.queued), 'uploaded': self.uploaded},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+
+    def queue(self, paths):
+        '''
+            Queue files for upload and save the state at once
+            -> a file changed before a kill is still uploaded after restart
+        '''
+        if not self.upload or not paths:
+            return
+        self.queued.update(paths)
+        self.save_state()
+
+
+    def fetch(self, type):
+        '''
+            Fetch and save pending timestamps in order
+            Stops at the first timestamp without data (not published yet), at a failed
+            request (tried again next cycle) or on stop signal
+            Returns the paths of new daily files
+        '''
+        dataset = self.datasets[type]
+        fetch = self.api.fetch_weather if type == 'SFC' else self.api.fetch_marine
+        new_files = []
+        start = time.time()
+        rows = nbytes = 0
+
+        for tm in self.pending(type):
+            if self.stop_event.is_set():
+                break
+            try:
+                df = fetch(tm)
+            except Exception as e:
+                # URL of error has authKey -> hidden before print / metrics
+                error = self.api.hide_key(e)
+                print(f'{type} {tm} : request failed -> {error}')
+                with self.lock:
+                    self.metrics['errors'] += 1
+                    self.metrics['last_error'] = f'{type} {tm} : {error}'
+                break
+            if df.empty:
+                # bad timestamp without data -> backoff again, the next timestamps still run
+                if tm in self.bad[type]:
+                    self.mark_bad(type, tm, ['no data'])
+                    self.save_state()
+                    continue
+                print(f'{type} {tm} : not published yet')
+                break
+
+            out_path = os.path.join(dataset['dir'], f'{tm}.csv')
+            self.api.save_csv(df, out_path)
+            new_files.append(out_path)
+            rows += len(df)
+            nbytes += os.path.getsize(out_path)
+            print(f'{type} {tm} : {len(df)} rows saved')
+
+        elapsed = time.time() - start
+        with self.lock:
+            metrics = self.metrics[type]
+            metrics['files'] += len(new_files)
+            metrics['rows'] += rows
+            metrics['bytes'] += nbytes
+            if new_files:
+                metrics['rows_per_s'] = round(rows / max(elapsed, 1e-9), 1)
+        return new_files
+
+
+    def publish(self, type, new_files):
+        '''
+            Validate new files and append the good ones into merged csv
+            Failed files are quarantined and their timestamps marked bad
+            Returns True if merged csv changed
+        '''
+        dataset = self.datasets[type]
+        reports = self.validator.validate(new_files, type)
+        for report in reports:
+            tm = os.path.basename(report['file'])[:-4]
+            if report['ok']:
+                self.bad[type].pop(tm, None)
+            else:
+                self.validator.quarantine(report, type)
+                self.mark_bad(type, tm, report['errors'])
+        self.save_state()
+
+        failed = sum(not report['ok'] for report in reports)
+        with self.lock:
+            self.metrics[type]['quarantined'] += failed
+            self.metrics[type]['bad'] = len(self.bad[type])
+
+        if failed == len(new_files):
+            return False
+        # queued before merge -> killed after merge, the merged csv is still uploaded on restart
+        self.queue([dataset['merged']])
+        # files are validated above -> not validated again by merge
+        self.merger.merge(dataset['dir'], type, incremental=True, out_path=dataset['merged'], validate=False)
+        return True
+
+
+    def flush_uploads(self, force=False):
+        '''
+            Load queued files into the warehouse
+                station files : station tables loaded again at once (reload_stations)
+                merged files : uploaded into S3 if the last upload is older than upload_interval
+            param :
+                force : upload every queued merged file (on stop)
+            Returns the loaded files
+        '''
+        now = time.time()
+        merged = {dataset['merged'] for dataset in self.datasets.values()}
+        stations = sorted(path for path in self.queued if path not in merged)
+        due = [path for path in sorted(self.queued & merged)
+               if force or now - self.uploaded.get(path, 0) >= self.upload_interval]
+
+        if stations:
+            self.reload_stations(stations)
+        if due:
+            load_into_s3(files=due)
+            with self.lock:
+                self.metrics['uploads'] += len(due)
+
+        for path in stations + due:
+            self.queued.discard(path)
+            self.uploaded[path] = now
+        if stations or due:
+            self.save_state()
+        return stations + due
+
+
+    def update_lag(self):
+        '''
+            Lag = now - end of the latest observation stored
+        '''
+        now = self.now()
+        with self.lock:
+            for type in self.datasets:
+                latest = self.latest(type)
+                if latest is None:
+                    continue
+                observed = latest + timedelta(days=1) if type == 'SFC' else latest
+                self.metrics[type]['latest'] = latest.strftime(self.datasets[type]['fmt'])
+                self.metrics[type]['lag_s'] = round((now - observed).total_seconds())
+
+
+    def reload_stations(self, paths):
+        '''
+            Load the changed station files into their tables again
+            Small files are loaded directly (load_into_s3 skips them), a large one
+            is uploaded into S3 first -> both through backend.load_table
+            Returns the reloaded tables
+        '''
+        schemas = {os.path.abspath(local_file(schema)): schema
+                   for name, schema in SCHEMAS.items() if name.startswith('stn_')}
+        schemas = [schemas[os.path.abspath(path)] for path in paths if os.path.abspath(path) in schemas]
+        if not schemas:
+            return []
+
+        large = [local_file(schema) for schema in schemas if not is_direct_load(local_file(schema))]
+        if large:
+            load_into_s3(files=large)
+
+        backend = get_backend()
+        backend.connect()
+        try:
+            backend.prepare()
+            for schema in schemas:
+                results = backend.load_table(schema)
+                rejected = sum(result['rejected'] for result in results)
+                print(f'{schema.table} reloaded ({rejected} rows rejected)')
+        finally:
+            backend.close()
+        with self.lock:
+            self.metrics['uploads'] += len(schemas)
+        return [schema.table for schema in schemas]
+
+
+    def error(self, span, step, e):
+        '''
+            Count error of a step -> the loop goes on
+        '''
+        span.fail(e)
+        error = self.api.hide_key(e)
+        print(f'Error in {step} : {error}')
+        with self.lock:
+            self.metrics['errors'] += 1
+            self.metrics['last_error'] = f'{step} : {error}'
+
+
+    def cycle(self):
+        '''
+            One poll -> fetch, validate, merge, upload
+            An error of a step is counted and the next step still runs
+        '''
+        changed = []
+        with tracer.span('ingest_daemon.cycle') as span:
+            for type, dataset in self.datasets.items():
+                if self.stop_event.is_set():
+                    break
+                try:
+                    new_files = self.fetch(type)
+                    if new_files and self.publish(type, new_files):
+                        changed.append(dataset['merged'])
+                except Exception as e:
+                    self.error(span, f'{type} cycle', e)
+
+            # Station info -> cached with TTL, so most cycles make no request
+            if self.stn_infs and not self.stop_event.is_set():
+                try:
+                    refreshed = self.api.refresh_locations(self.stn_infs)
+                    self.queue(refreshed)
+                    changed += refreshed
+                except Exception as e:
+                    self.error(span, 'station refresh', e)
+
+            # Changed files are queued in the state file -> kept until loaded (retried next cycle on error)
+            if self.upload:
+                try:
+                    self.flush_uploads(force=self.stop_event.is_set())
+                except Exception as e:
+                    self.error(span, 'upload', e)
+            span.set(changed=len(changed))
+
+        self.update_lag()
+        with self.lock:
+            self.metrics['cycles'] += 1
+        return changed
+
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.metrics))
+
+
+    def save_metrics(self):
+        '''
+            Write metrics into METRICS_PATH (temp file then replace)
+        '''
+        with self.lock:
+            self.metrics['updated'] = datetime.now(KST).isoformat(timespec='seconds')
+        os.makedirs(os.path.dirname(self.metrics_path) or '.', exist_ok=True)
+        with open(self.metrics_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(self.metrics_path + '.tmp', self.metrics_path)
+
+
+    def clean_partial(self):
+        '''
+            Remove temp files left by a killed run (SIGKILL, power off)
+        '''
+        folders = {dataset['dir'] for dataset in self.datasets.values()}
+        folders |= {os.path.dirname(dataset['merged']) or '.' for dataset in self.datasets.values()}
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for file in os.listdir(folder):
+                if file.endswith('.tmp'):
+                    os.remove(os.path.join(folder, file))
+                    print(f'Removed partial file : {file}')
+
+
+    def stop(self, signum=None, frame=None):
+        '''
+            Stop after the running step (signal handler)
+        '''
+        if not self.stop_event.is_set():
+            print('Stop requested -> finishing current step')
+        self.stop_event.set()
+
+
+    def run(self, once=False):
+        '''
+            Poll until stopped
+            param :
+                once : run one cycle and return (for cron / test)
+        '''
+        # signal handler only sets the event -> files are never cut in the middle
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+
+        self.clean_partial()
+        with self.lock:
+            self.metrics['status'] = 'running'
+        print(f'Ingest daemon started (interval {self.interval:g}s, marine step {self.marine_step})')
+
+        while not self.stop_event.is_set():
+            changed = self.cycle()
+            self.save_metrics()
+
+            # one trace file per cycle with new data -> spans do not pile up in memory
+            if changed:
+                tracer.print_summary()
+                print(f'Trace saved : {tracer.export()}')
+            tracer.reset()
+
+            if once:
+                break
+            self.stop_event.wait(self.interval)
+
+        # merged files not uploaded yet -> sent before exit
+        if self.upload and self.queued:
+            try:
+                self.flush_uploads(force=True)
+            except Exception as e:
+                print(f'Error in upload : {self.api.hide_key(e)}')
+
+        with self.lock:
+            self.metrics['status'] = 'stopped'
+        self.save_metrics()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        print('Ingest daemon stopped')
+
+
+if __name__ == '__main__':
+    pd.set_option('future.no_silent_downcasting', True)
+    parser = argparse.ArgumentParser(description='Continuous ingestion of the latest KMA observations')
+    parser.add_argument('--interval', type=float, default=None, help='seconds between polls')
+    parser.add_argument('--marine-step', default=None, help='interval of marine timestamps (only 1d)')
+    parser.add_argument('--metrics-port', type=int, default=None, help='serve metrics at /metrics')
+    parser.add_argument('--no-upload', action='store_true', help='skip S3 upload')
+    parser.add_argument('--upload-interval', type=float, default=None, help='min seconds between uploads of merged csv')
+    parser.add_argument('--once', action='store_true', help='run one cycle and exit')
+    args = parser.parse_args()
+
+    daemon = ingest_daemon(args.interval, args.marine_step, upload=not args.no_upload,
+                           metrics_port=args.metrics_port, upload_interval=args.upload_interval)
+    daemon.run(once=args.once)
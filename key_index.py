@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+class key_index:
+    '''
+        Persistent index of the keys already in a merged csv
+        Keys (ex - TM, STN) are hashed into uint64 and kept as a sorted array in .npy
+        -> checking new rows costs O(new rows * log N) without reading merged csv
+
+        param :
+            path : the path of .npy file (None -> in memory only)
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        if path and os.path.exists(path):
+            self.keys = np.load(path)
+        else:
+            self.keys = np.empty(0, dtype=np.uint64)
+
+
+    @staticmethod
+    def hash_keys(df, columns):
+        '''
+            Hash key columns of each row into uint64
+            Values are hashed as string -> 20150101 (int) and '20150101' (str) are same key
+
+            param :
+                df : data frame having key columns
+                columns : key columns
+        '''
+        if df.empty:
+            return np.empty(0, dtype=np.uint64)
+        keys = df[columns].astype(str)
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64)
+
+
+    @classmethod
+    def from_csv(cls, csv_path, columns, path=None):
+        '''
+            Build index from the key columns of an existing csv
+            param :
+                csv_path : merged csv
+                columns : key columns
+                path : the path of .npy file
+        '''
+        index = cls(None)
+        index.path = path
+        df = pd.read_csv(csv_path, usecols=columns, dtype=str, keep_default_na=False)
+        index.add(cls.hash_keys(df, columns))
+        return index
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def contains(self, hashes):
+        '''
+            Boolean mask -> True if hash is already in index
+        '''
+        if not len(self.keys):
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.searchsorted(self.keys, hashes)
+        pos[pos == len(self.keys)] = 0
+        return self.keys[pos] == hashes
+
+
+    def add(self, hashes):
+        '''
+            Insert new hashes into the sorted keys
+            Only the new hashes are sorted, then inserted at their positions
+            -> the index is never sorted again as a whole
+        '''
+        hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+        hashes = hashes[~self.contains(hashes)]
+        if len(hashes):
+            self.keys = np.insert(self.keys, np.searchsorted(self.keys, hashes), hashes)
+
+
+    def save(self):
+        '''
+            Write index atomically (temp file then replace)
+        '''
+        tmp_path = self.path + '.tmp.npy'
+        np.save(tmp_path, self.keys)
+        os.replace(tmp_path, self.path)
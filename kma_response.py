@@ -0,0 +1,130 @@
+import os
+import pandas as pd
+
+
+# Units that stn_inf.php writes on the second header line (ex - HT_PA_m -> HT_PA / m)
+LOCATION_UNITS = ('degee', 'degree', 'deg', 'm')
+
+DASH = '#' + '-' * 98
+
+
+def read_raw_csv(path):
+    '''
+        Read a stored daily csv as plain strings -> values are rendered back exactly as stored
+        param :
+            path : the path of csv file
+    '''
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+
+
+def load_help_lines(meta_path, columns):
+    '''
+        Rebuild the '#' field description lines of the help session
+        Descriptions are taken from meta txt (weather_meta.txt) when it exists
+
+        param :
+            meta_path : the path of meta txt saved from the API
+            columns : column names of data
+    '''
+    desc = {}
+    if meta_path and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.lstrip('#').split(':', 1)
+                if len(parts) == 2 and len(parts[0].split()) == 2:
+                    desc[parts[0].split()[1]] = parts[1].strip()
+
+    return [f'#{i:3d}. {col:<13} : {desc.get(col, col)}' for i, col in enumerate(columns, 1)]
+
+
+def render_weather(df, meta_path=None):
+    '''
+        Render daily surface data into the text of kma_sfcdd.php (disp=1, help=1)
+        The output is parsed back by API_Request.parse_weather
+
+        param :
+            df : daily surface data (all values as string)
+            meta_path : weather_meta.txt for the field descriptions
+    '''
+    columns = list(df.columns)
+    lines = [
+        '#START7777',
+        DASH,
+        '#  지상관측 일자료 [입력인수형태][예] ?tm=20150101&stn=0&disp=1&help=1',
+        DASH
+    ]
+    lines += load_help_lines(meta_path, columns)
+    lines += [
+        DASH,
+        '# ' + ','.join(columns),
+        '#',
+        DASH,
+        '#'
+    ]
+    lines += [','.join(row) + ',=' for row in df.astype(str).itertuples(index=False, name=None)]
+    lines.append('#7777END')
+    return '\n'.join(lines) + '\n'
+
+
+def render_marine(df, meta_path=None, tp='B'):
+    '''
+        Render marine observation into the text of sea_obs.php
+        The output is parsed back by API_Request.parse_marine
+
+        param :
+            df : marine observation (all values as string)
+            meta_path : marine_meta.txt for the field descriptions
+            tp : the observation type written on the first field
+    '''
+    lines = [
+        '#START7777',
+        DASH,
+        '#  해양기상관측 자료 [입력인수형태][예] ?tm=201501011400&stn=0&help=1',
+        DASH,
+        '#  관측자료 설명'
+    ]
+    if meta_path and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            lines += ['# ' + line.rstrip('\n') for line in f]
+    else:
+        lines.append(DASH)
+
+    # column names are split into 2 header lines (ex - WS_m/s -> WS / m/s)
+    heads, subs = zip(*(col.split('_', 1) for col in df.columns))
+    lines.append('# ' + ' '.join(heads))
+    lines.append('# ' + ' '.join(subs))
+
+    lines += [f'{tp}, ' + ', '.join(row) + ', =' for row in df.astype(str).itertuples(index=False, name=None)]
+    lines.append('#7777END')
+    return '\n'.join(lines) + '\n'
+
+
+def render_location(df, inf='SFC'):
+    '''
+        Render station info into the text of stn_inf.php (help=0)
+        The output is parsed back by API_Request.parse_location
+
+        param :
+            df : station info (all values as string)
+            inf : The information about Stations (SFC, AWS, NKO, UV, BUOY)
+    '''
+    df = df.copy()
+
+    # BASIN is dropped by the parser for SFC -> add it back
+    if inf == 'SFC' and 'BASIN' not in df.columns:
+        df['BASIN'] = '----'
+
+    heads, subs = [], []
+    for col in df.columns:
+        head, _, sub = col.rpartition('_')
+        if head and sub in LOCATION_UNITS:
+            heads.append(head)
+            subs.append(sub)
+        else:
+            heads.append(col)
+            subs.append('-' * max(len(col), 2))
+
+    lines = ['#START7777', '# ' + ' '.join(heads), '# ' + ' '.join(subs)]
+    lines += [' '.join(row) for row in df.astype(str).itertuples(index=False, name=None)]
+    lines.append('#7777END')
+    return '\n'.join(lines) + '\n'
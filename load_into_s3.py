@@ -1,11 +1,20 @@
 import os, boto3
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from tracing import tracer
+from schema_registry import SCHEMAS
+from data_validator import data_validator
+from warehouse_backend import is_direct_load
 
 
 class load_into_s3:
 
-    def __init__(self):
+    def __init__(self, files=None):
+        '''
+            param :
+                files : local files to upload (None -> all files of dirs)
+                    ingest_daemon passes only the files changed in its cycle
+        '''
         print(' ------ Preparing to load the data into S3. ------')
 
         # Get significant data from .env
@@ -33,9 +42,26 @@ class load_into_s3:
             region_name = self.region
         )
 
+        # Only the given files
+        if files is not None:
+            files = {os.path.abspath(file) for file in files}
+            dirs = {dir: s3_loc for dir, s3_loc in dirs.items() if dir and os.path.abspath(dir) in files}
+
+        # Dataset of each stage file -> validated before uploading
+        datasets = {schema.stage_file: name for name, schema in SCHEMAS.items()}
+        validator = data_validator()
+
         # Run load_data into S3 
-        for dir, s3_loc in dirs.items():
-            self.load(s3, dir, s3_loc)
+        with tracer.span('load_into_s3.run', bucket=self.bucket):
+            for dir, s3_loc in dirs.items():
+                type = datasets.get(os.path.basename(s3_loc))
+                if type and not validator.check(dir, type):
+                    print(f'{os.path.basename(dir)} : Failed validation -> Skip UPLOAD (file kept)')
+                    continue
+                if type and is_direct_load(dir):
+                    print(f'{os.path.basename(dir)} : Small file loaded directly by snowflake_controller -> Skip UPLOAD')
+                    continue
+                self.load(s3, dir, s3_loc)
         
 
     def load(self, client, dir, s3_loc):
@@ -54,36 +80,42 @@ class load_into_s3:
                 s3_loc : the target directory in S3
         '''
         
-        # Get size of local data
-        local_size = os.path.getsize(dir)
+        with tracer.span('load_into_s3.load', key=s3_loc) as span:
+            # Get size of local data
+            local_size = os.path.getsize(dir)
         
-        try:
-            # Request data from S3 to see the uploading data already in S3 bucket
+            try:
+                # Request data from S3 to see the uploading data already in S3 bucket
             
-            # Get data in S3 bucket size
-            response = client.head_object(Bucket=self.bucket, Key=s3_loc)
-            s3_size = response['ContentLength']
+                # Get data in S3 bucket size
+                response = client.head_object(Bucket=self.bucket, Key=s3_loc)
+                s3_size = response['ContentLength']
+                span.add('retries', response['ResponseMetadata'].get('RetryAttempts', 0))
 
-            # First condition check
-            if local_size == s3_size:
-                print(f'{os.path.basename(dir)} : Already exists in S3 -> Skip UPLOAD')
-                return
-            else: # Second condition check
-                print(f'{os.path.basename(dir)} : File size is different -> Delete and UPLOAD New data')
-                client.delete_object(Bucket=self.bucket, Key=s3_loc)
+                # First condition check
+                if local_size == s3_size:
+                    print(f'{os.path.basename(dir)} : Already exists in S3 -> Skip UPLOAD')
+                    span.set(action='skip')
+                    return
+                else: # Second condition check
+                    print(f'{os.path.basename(dir)} : File size is different -> Delete and UPLOAD New data')
+                    client.delete_object(Bucket=self.bucket, Key=s3_loc)
 
-        except ClientError as e:
-            # Last condition check
-            if e.response['Error']['Code'] == '404':
-                print(f'{os.path.basename(dir)} : does not exist in S3 -> UPLOAD')
-            else:
-                raise
+            except ClientError as e:
+                # Last condition check
+                if e.response['Error']['Code'] == '404':
+                    print(f'{os.path.basename(dir)} : does not exist in S3 -> UPLOAD')
+                else:
+                    raise
 
-        # Uploading data into S3 bucket
-        client.upload_file(dir, self.bucket, s3_loc)
-        print(f'The file({os.path.basename(dir)}) Uploading in progress at {s3_loc}')
+            # Uploading data into S3 bucket
+            client.upload_file(dir, self.bucket, s3_loc)
+            span.set(action='upload')
+            span.add('bytes_out', local_size)
+            print(f'The file({os.path.basename(dir)}) Uploading in progress at {s3_loc}')
 
 
 
 if __name__ == '__main__':
-    load_into_s3()
\ No newline at end of file
+    load_into_s3()
+    tracer.finish()
\ No newline at end of file
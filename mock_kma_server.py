@@ -0,0 +1,283 @@
+import os, json, time, random, argparse, threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+
+import kma_response
+
+
+class mock_config:
+    '''
+        Fault injection settings of mock server
+        Every rate is the probability (0 ~ 1) for one request
+
+        param :
+            latency_ms : fixed delay before each response
+            jitter_ms : extra random delay (0 ~ jitter_ms)
+            rate_limit_rate : probability of 429 Too Many Requests
+            error_rate : probability of 5xx (500, 502, 503)
+            truncate_rate : probability of body cut at random point
+            seed : random seed -> same sequence of faults for same seed
+    '''
+
+    def __init__(self, latency_ms=0, jitter_ms=0, rate_limit_rate=0.0, error_rate=0.0,
+                 truncate_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+
+    def draw(self):
+        '''
+            Decide the fault of one request -> (delay sec, fault name or None, detail)
+            Every random value is drawn here under the lock -> same seed, same faults
+                5xx : detail is the status (500, 502, 503)
+                truncate : detail is the ratio of body kept (0 ~ 1)
+        '''
+        with self.lock:
+            delay = (self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000
+            roll = self.random.random()
+            status = self.random.choice((500, 502, 503))
+            keep = self.random.random()
+
+        if roll < self.rate_limit_rate:
+            return delay, '429', None
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return delay, '5xx', status
+        roll -= self.error_rate
+        if roll < self.truncate_rate:
+            return delay, 'truncate', keep
+        return delay, None, None
+
+
+class kma_store:
+    '''
+        Responses of mock server built from the stored daily files
+        Rendered text is cached per file so that the server cost stays small
+    '''
+
+    def __init__(self, weather_dir, marine_dir, stn_dir):
+        self.weather_dir = weather_dir
+        self.marine_dir = marine_dir
+        self.stn_dir = stn_dir
+        # path -> parsed frame, cached per store -> freed with the server (lru_cache on a method keeps self)
+        self.frames = {}
+        self.frames_lock = threading.Lock()
+        self.max_frames = 512
+
+
+    def latest(self, path):
+        files = sorted(file for file in os.listdir(path) if file.endswith('.csv'))
+        return files[-1][:-4] if files else None
+
+
+    def frame(self, path):
+        with self.frames_lock:
+            if path in self.frames:
+                return self.frames[path]
+        df = kma_response.read_raw_csv(path)
+        with self.frames_lock:
+            # oldest frame is dropped first (dict keeps insertion order)
+            if len(self.frames) >= self.max_frames:
+                self.frames.pop(next(iter(self.frames)))
+            self.frames[path] = df
+        return df
+
+
+    def select(self, df, column, stn):
+        '''
+            Filter rows by station list separated with ':' (None or 0 -> all station)
+        '''
+        if not stn or stn == '0':
+            return df
+        return df[df[column].isin(stn.split(':'))]
+
+
+    def frame_or_empty(self, path, sample_dir):
+        '''
+            Stored file of tm, empty frame with same columns if no data for tm
+        '''
+        if os.path.exists(path):
+            return self.frame(path)
+        sample = self.latest(sample_dir)
+        return self.frame(os.path.join(sample_dir, f'{sample}.csv')).iloc[0:0]
+
+
+    def weather(self, tm, stn):
+        tm = tm[:8] if tm else self.latest(self.weather_dir)
+        df = self.frame_or_empty(os.path.join(self.weather_dir, f'{tm}.csv'), self.weather_dir)
+        return kma_response.render_weather(self.select(df, 'STN', stn),
+                                           os.path.join(self.weather_dir, 'weather_meta.txt'))
+
+
+    def marine(self, tm, stn):
+        tm = tm if tm else self.latest(self.marine_dir)
+        df = self.frame_or_empty(os.path.join(self.marine_dir, f'{tm}.csv'), self.marine_dir)
+        return kma_response.render_marine(self.select(df, 'STN_ID', stn),
+                                          os.path.join(self.marine_dir, 'marine_meta.txt'))
+
+
+    def location(self, inf, stn):
+        path = os.path.join(self.stn_dir, f'stn_{inf}_info.csv')
+        if not os.path.exists(path):
+            return None
+        return kma_response.render_location(self.select(self.frame(path), 'STN_ID', stn), inf)
+
+
+class mock_handler(BaseHTTPRequestHandler):
+    '''
+        Handler of kma_sfcdd.php, stn_inf.php and sea_obs.php
+        The last part of path is used -> any base URL prefix works
+    '''
+
+    protocol_version = 'HTTP/1.1'
+
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+    def send_text(self, status, text, headers=None):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, val in (headers or {}).items():
+            self.send_header(key, val)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(status)
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rsplit('/', 1)[-1]
+        query = {key: val[0] for key, val in parse_qs(url.query).items()}
+
+        # stats of server -> for load test report
+        if endpoint == 'stats':
+            return self.send_text(200, json.dumps(self.server.stats))
+
+        if 'authKey' not in query:
+            return self.send_text(401, 'authKey is required\n')
+
+        # tm is joined into the path of stored file -> digits only
+        tm = query.get('tm')
+        if tm is not None and not (tm.isascii() and tm.isdigit()):
+            return self.send_text(400, 'tm must be digits (yyyymmdd or yyyymmddhhmm)\n')
+
+        delay, fault, detail = self.server.config.draw()
+        if delay:
+            time.sleep(delay)
+
+        if fault == '429':
+            return self.send_text(429, 'Too Many Requests\n', {'Retry-After': '1'})
+        if fault == '5xx':
+            return self.send_text(detail, 'Server Error\n')
+
+        store = self.server.store
+        if endpoint == 'kma_sfcdd.php':
+            text = store.weather(tm, query.get('stn'))
+        elif endpoint == 'sea_obs.php':
+            text = store.marine(tm, query.get('stn'))
+        elif endpoint == 'stn_inf.php':
+            text = store.location(query.get('inf', 'SFC'), query.get('stn'))
+        else:
+            text = None
+
+        if text is None:
+            return self.send_text(404, 'Not Found\n')
+
+        # cut body at random point -> END mark and part of rows are lost
+        if fault == 'truncate':
+            text = text[:max(1, int((len(text) - 1) * detail))]
+            self.server.count('truncated')
+
+        self.send_text(200, text)
+
+
+class mock_kma_server(ThreadingHTTPServer):
+    '''
+        Local mock of apihub.kma.go.kr for offline load test of API_Request
+        Run API_Request(base_url=server.base_url) or set KMA_BASE_URL
+
+        param :
+            host, port : address of server (port 0 -> random free port)
+            config : mock_config for fault injection
+            weather_dir, marine_dir, stn_dir : stored data used for responses
+            verbose : print access log
+    '''
+
+    daemon_threads = True
+
+
+    def __init__(self, host='127.0.0.1', port=8080, config=None, weather_dir=None,
+                 marine_dir=None, stn_dir='data', verbose=False):
+        load_dotenv()
+        super().__init__((host, port), mock_handler)
+        self.config = config if config else mock_config()
+        self.store = kma_store(
+            weather_dir or os.getenv('FILES_PATH_weather', 'data/weather_condition'),
+            marine_dir or os.getenv('FILES_PATH_marine', 'data/marine_condition'),
+            stn_dir
+        )
+        self.verbose = verbose
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.thread = None
+
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api/typ01/url/'
+
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[str(key)] = self.stats.get(str(key), 0) + 1
+
+
+    def start(self):
+        '''
+            Serve on a background thread -> for use inside a test or benchmark
+        '''
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock KMA API server built from stored daily files')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='probability of 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of 5xx')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='probability of truncated body')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    config = mock_config(args.latency_ms, args.jitter_ms, args.rate_limit_rate,
+                         args.error_rate, args.truncate_rate, args.seed)
+    server = mock_kma_server(args.host, args.port, config, verbose=args.verbose)
+    print(f'Mock KMA server running at {server.base_url} (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f'Mock KMA server stopped : {server.stats}')
+    finally:
+        server.server_close()
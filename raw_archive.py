@@ -0,0 +1,293 @@
+import os, json, gzip, hashlib, argparse, threading, time
+from urllib.parse import urlparse, parse_qsl, urlencode
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+from tracing import tracer
+
+
+# dataset -> endpoint of its responses (daily file name from params)
+#   marine : snapshot of one tm per file (data/marine_condition)
+#   marine_range : responses of range mode (source 'range') -> per-day partitions (data/marine_range)
+ENDPOINTS = {
+    'SFC': 'kma_sfcdd.php',
+    'marine': 'sea_obs.php',
+    'marine_range': 'sea_obs.php',
+    'stn': 'stn_inf.php'
+}
+
+
+class raw_archive:
+    '''
+        Content-addressed archive of raw API responses
+        Body is stored gzip-compressed once per sha256 (same body -> one object),
+        the index maps (endpoint, params) into the hash of each fetch
+
+            data/raw_archive/objects/{hash[:2]}/{hash}.gz   -> raw body
+            data/raw_archive/index.jsonl                    -> key, endpoint, params, hash, fetched, source
+
+        authKey is removed from params -> never stored
+        Latest fetch of same key wins when the archive is read
+
+        param :
+            root : folder of archive (RAW_ARCHIVE_DIR in .env, default data/raw_archive)
+    '''
+
+    def __init__(self, root=None):
+        load_dotenv()
+        self.root = root if root else os.getenv('RAW_ARCHIVE_DIR', 'data/raw_archive')
+        self.index_path = os.path.join(self.root, 'index.jsonl')
+        self.lock = threading.Lock()
+
+
+    @staticmethod
+    def make_key(url):
+        '''
+            Endpoint and sorted params (without authKey) of request URL
+            Returns (key, endpoint, params)
+        '''
+        parsed = urlparse(url)
+        endpoint = parsed.path.rsplit('/', 1)[-1]
+        params = {key: val for key, val in parse_qsl(parsed.query) if key != 'authKey'}
+        key = endpoint + '?' + urlencode(sorted(params.items()))
+        return key, endpoint, params
+
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest + '.gz')
+
+
+    def put(self, url, text, source=None):
+        '''
+            Store raw body of one response
+            param :
+                url : request URL (authKey is dropped)
+                text : response text
+                source : fetch mode of response (ex - range), None -> not recorded
+            Returns hash of body
+        '''
+        body = text.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        key, endpoint, params = self.make_key(url)
+
+        # same body already stored -> only the index line is added
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(body, compresslevel=6))
+            os.replace(tmp_path, path)
+
+        record = {'key': key, 'endpoint': endpoint, 'params': params, 'hash': digest,
+                  'bytes': len(body), 'fetched': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        if source:
+            record['source'] = source
+        with self.lock, open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        span = tracer.current()
+        if span:
+            span.set(archived=digest[:12])
+        return digest
+
+
+    def read(self, digest):
+        '''
+            Raw body of hash as text
+        '''
+        with open(self.object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+
+    def entries(self, endpoint=None):
+        '''
+            Latest index record of each key (optionally one endpoint only)
+        '''
+        latest = {}
+        if not os.path.exists(self.index_path):
+            return latest
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if endpoint is None or record['endpoint'] == endpoint:
+                    latest[record['key']] = record
+        return latest
+
+
+    def get(self, url):
+        '''
+            Latest raw body stored for the request URL (None if never fetched)
+        '''
+        record = self.entries().get(self.make_key(url)[0])
+        return self.read(record['hash']) if record else None
+
+
+    def stats(self):
+        '''
+            Number of index records, keys, objects and bytes (raw / compressed)
+        '''
+        records = raw_bytes = 0
+        seen = set()
+        latest = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        records += 1
+                        latest[record['key']] = record
+                        if record['hash'] not in seen:
+                            seen.add(record['hash'])
+                            raw_bytes += record['bytes']
+        stored = sum(os.path.getsize(self.object_path(digest)) for digest in seen
+                     if os.path.exists(self.object_path(digest)))
+        return {'records': records, 'keys': len(latest), 'objects': len(seen),
+                'raw_bytes': raw_bytes, 'stored_bytes': stored}
+
+
+def reparse_chunk(root, type, records, out_dir):
+    '''
+        Parse archived responses into daily files (runs in worker process)
+        marine_range : all records of a day are in the same chunk -> one save per day
+        Returns (files written, rows, failed keys)
+    '''
+    # import here -> each worker process builds its own parser
+    from API_request import API_Request
+
+    archive = raw_archive(root)
+    api = API_Request()
+    written = rows = 0
+    failed = []
+    days = {}
+    for record in records:
+        try:
+            text = archive.read(record['hash'])
+            params = record['params']
+            if type == 'marine_range':
+                meta, df = api.parse_marine(text)
+                if not df.empty:
+                    days.setdefault(params['tm'][:8], []).append(df)
+                continue
+            elif type == 'SFC':
+                df = api.parse_weather(text)
+                out_path = os.path.join(out_dir, f"{params['tm']}.csv")
+            elif type == 'marine':
+                meta, df = api.parse_marine(text)
+                out_path = os.path.join(out_dir, f"{params['tm']}.csv")
+            else:
+                inf = params.get('inf', 'SFC')
+                df = api.parse_location(text, inf)
+                out_path = os.path.join(out_dir, f'stn_{inf}_info.csv')
+
+            api.save_csv(df, out_path)
+            written += 1
+            rows += len(df)
+        except Exception as e:
+            failed.append(f"{record['key']} : {e}")
+
+    # records are sorted by tm -> later timestamp wins for same (TM_KST, STN_ID) like range mode
+    for day, frames in days.items():
+        try:
+            count, dup = api.save_marine_day(day, frames, out_dir)
+            written += 1
+            rows += count
+        except Exception as e:
+            failed.append(f'{day} : {e}')
+    return written, rows, failed
+
+
+def select(records, type):
+    '''
+        Records used for the dataset, sorted by tm
+            SFC, marine : responses of all stations (no stn param) with tm, not from range mode
+            marine_range : responses of range mode (stn param allowed like the fetch)
+            stn : every station info response
+    '''
+    if type == 'marine_range':
+        records = [record for record in records if record.get('source') == 'range']
+    else:
+        records = [record for record in records if record.get('source') != 'range'
+                   and record['params'].get('stn', '0') in ('', '0')]
+    if type != 'stn':
+        records = [record for record in records if record['params'].get('tm')]
+    return sorted(records, key=lambda record: (record['params'].get('tm', ''), record['key']))
+
+
+def chunk(records, type, chunk_size):
+    '''
+        Split records into tasks of chunk_size
+        marine_range : a day is never split -> its partition is written by one process
+    '''
+    if type != 'marine_range':
+        return [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+
+    chunks, current = [], []
+    for i, record in enumerate(records):
+        current.append(record)
+        last_of_day = i + 1 == len(records) or records[i + 1]['params']['tm'][:8] != record['params']['tm'][:8]
+        if last_of_day and len(current) >= chunk_size:
+            chunks.append(current)
+            current = []
+    return chunks + ([current] if current else [])
+
+
+def reparse(type, out_dir=None, workers=None, root=None, chunk_size=64):
+    '''
+        Rebuild daily files from the archive without any request
+        Files are written into a separate folder by default -> live data is never overwritten,
+        compare / move them into place after checking
+
+        param :
+            type : SFC, marine, marine_range or stn (station info)
+            out_dir : folder of rebuilt files (None -> REPARSE_DIR/{type}, default data/reparse/{type})
+            workers : number of processes (None -> number of CPU)
+            root : folder of archive
+            chunk_size : responses per task
+    '''
+    load_dotenv()
+    out_dir = out_dir if out_dir else os.path.join(os.getenv('REPARSE_DIR', 'data/reparse'), type)
+    os.makedirs(out_dir, exist_ok=True)
+
+    archive = raw_archive(root)
+    records = select(archive.entries(ENDPOINTS[type]).values(), type)
+    chunks = chunk(records, type, chunk_size)
+
+    start = time.time()
+    written = rows = 0
+    failed = []
+    with tracer.span('raw_archive.reparse', type=type, responses=len(records)) as span, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(reparse_chunk, archive.root, type, records, out_dir) for records in chunks]
+        for future in as_completed(futures):
+            files, count, errors = future.result()
+            written += files
+            rows += count
+            failed += errors
+        span.add('rows', rows)
+        span.set(files=written, failed=len(failed))
+
+    print(f'{type} : {written} files rebuilt into {out_dir} ({rows} rows, {time.time() - start:.2f} sec)')
+    for error in failed:
+        print(f'Re-parse failed : {error}')
+    return {'files': written, 'rows': rows, 'failed': failed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Raw API response archive')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('reparse', help='rebuild daily files from archive (no request)')
+    command.add_argument('--type', default='SFC', choices=list(ENDPOINTS))
+    command.add_argument('--out', default=None, help='folder of rebuilt files (default data/reparse/{type})')
+    command.add_argument('--workers', type=int, default=None)
+
+    commands.add_parser('stats', help='size of archive')
+    args = parser.parse_args()
+
+    if args.command == 'reparse':
+        reparse(args.type, args.out, args.workers)
+    else:
+        print(json.dumps(raw_archive().stats(), indent=2))
+    tracer.finish()
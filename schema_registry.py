@@ -0,0 +1,339 @@
+import re, io
+import pandas as pd
+
+
+class column:
+    '''
+        One column of dataset
+
+        param :
+            name : column name in csv (ex - WS_m/s)
+            dtype : pandas dtype used for read ('int64', 'float64', 'str')
+            sql_type : Snowflake type (INT, FLOAT, STRING, DATE)
+            unit : unit of value
+            sentinel : value the API writes for missing observation (None -> not used)
+            sql_name : column name in Snowflake (None -> made from name)
+            desc : description from API documentation
+            valid_range : (min, max) of physically possible value (None -> not checked)
+    '''
+
+    def __init__(self, name, dtype, sql_type, unit=None, sentinel=None, sql_name=None, desc='',
+                 valid_range=None):
+        self.name = name
+        self.dtype = dtype
+        self.sql_type = sql_type
+        self.unit = unit
+        self.sentinel = sentinel
+        self.sql_name = sql_name if sql_name else self.to_sql_name(name)
+        self.desc = desc
+        self.valid_range = valid_range
+
+
+    @staticmethod
+    def to_sql_name(name):
+        '''
+            Column name usable in Snowflake (ex - WS_m/s -> WS_M_S, HM_% -> HM_PERCENT)
+        '''
+        name = name.replace('%', 'PERCENT')
+        return re.sub(r'[^0-9A-Za-z_]', '_', name).upper()
+
+
+class dataset_schema:
+    '''
+        Schema of a dataset -> names, dtypes, units and sentinels of all columns
+        Reads, parsers and Snowflake DDL/COPY are generated from here
+
+        param :
+            name : name of dataset (SFC, marine, stn_SFC, stn_BUOY)
+            columns : list of column
+            key : columns identifying one observation
+            table : Snowflake table name (RAW_DATA schema)
+            stage_file : file name in stage (S3 raw/)
+            date_format : DATE_FORMAT of COPY (None -> not set)
+    '''
+
+    def __init__(self, name, columns, key, table, stage_file, date_format=None):
+        self.name = name
+        self.columns = columns
+        self.key = key
+        self.table = table
+        self.stage_file = stage_file
+        self.date_format = date_format
+        self.by_name = {col.name: col for col in columns}
+
+
+    @property
+    def names(self):
+        return [col.name for col in self.columns]
+
+
+    @property
+    def dtypes(self):
+        return {col.name: col.dtype for col in self.columns}
+
+
+    @property
+    def sentinels(self):
+        return {col.name: col.sentinel for col in self.columns if col.sentinel is not None}
+
+
+    @property
+    def date_column(self):
+        '''
+            Name of the observation date column (None if dataset has no date)
+        '''
+        for col in self.columns:
+            if col.sql_type == 'DATE':
+                return col.name
+        return None
+
+
+    def check_header(self, header):
+        '''
+            Raise ValueError if header from API does not match the schema
+            param :
+                header : column names parsed from the response
+        '''
+        header = list(header)
+        if header != self.names:
+            missing = [name for name in self.names if name not in header]
+            extra = [name for name in header if name not in self.by_name]
+            raise ValueError(f'{self.name} schema mismatch : missing {missing}, unexpected {extra}')
+
+
+    def read_csv(self, path, usecols=None, sentinel_as_nan=False, **kwargs):
+        '''
+            Read csv with explicit dtypes (no dtype inference)
+
+            param :
+                path : the path of csv file
+                usecols : only these columns are parsed (None -> all)
+                sentinel_as_nan : sentinel values are replaced into NaN
+                    (int64 columns having sentinel are read as nullable Int64)
+        '''
+        usecols = list(usecols) if usecols else self.names
+        dtype = {name: self.by_name[name].dtype for name in usecols}
+
+        na_values = None
+        if sentinel_as_nan:
+            na_values = {name: [self.by_name[name].sentinel] for name in usecols
+                         if self.by_name[name].sentinel is not None}
+            # int64 can not hold NA -> nullable int keeps the other values exact
+            dtype.update({name: 'Int64' for name in na_values if dtype[name] == 'int64'})
+
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, na_values=na_values, **kwargs)
+
+
+    def empty_frame(self):
+        '''
+            Data frame with no row but with all columns and dtypes
+        '''
+        return pd.DataFrame({col.name: pd.Series(dtype=col.dtype) for col in self.columns})
+
+
+    def read_many(self, paths):
+        '''
+            Read many csv files of the dataset with one pd.read_csv
+            Header of each file is checked, then the bodies are joined
+            -> dtypes are parsed once instead of per (small) daily file
+
+            param :
+                paths : the paths of csv files
+        '''
+        expected = ','.join(self.names)
+        chunks = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                header = f.readline().decode('utf-8-sig').strip()
+                body = f.read()
+            if header != expected:
+                raise ValueError(f'{path} : header does not match {self.name} schema')
+            if body and not body.endswith(b'\n'):
+                body += b'\n'
+            chunks.append(body)
+
+        data = b''.join(chunks)
+        if not data.strip():
+            return self.empty_frame()
+        return pd.read_csv(io.BytesIO(data), header=None, names=self.names, dtype=self.dtypes)
+
+
+    def create_sql(self, schema='RAW_DATA', type_map=None):
+        '''
+            CREATE TABLE statement of the dataset
+
+            param :
+                schema : schema of warehouse
+                type_map : type translation for other SQL dialect (ex - {'FLOAT': 'DOUBLE'})
+        '''
+        type_map = type_map if type_map else {}
+        body = ',\n'.join(f'    {col.sql_name} {type_map.get(col.sql_type, col.sql_type)}' for col in self.columns)
+        return f'CREATE OR REPLACE TABLE {schema}.{self.table} (\n{body}\n);'
+
+
+    def copy_sql(self, stage='@my_s3_stage', schema='RAW_DATA', file=None, on_error='CONTINUE'):
+        '''
+            COPY INTO statement loading stage file into the table
+
+            param :
+                stage : Snowflake stage
+                file : file name in the stage (None -> stage_file)
+                on_error : ON_ERROR option of COPY
+        '''
+        file_format = "TYPE=CSV FIELD_OPTIONALLY_ENCLOSED_BY='\"' SKIP_HEADER=1"
+        if self.date_format:
+            file_format += f' DATE_FORMAT={self.date_format}'
+
+        return (f'COPY INTO {schema}.{self.table}\n'
+                f'FROM {stage}/{file if file else self.stage_file}\n'
+                f'FILE_FORMAT=({file_format})\n'
+                f"ON_ERROR='{on_error}';")
+
+
+def _sfc_columns():
+    '''
+        Columns of kma_sfcdd.php (daily surface observation)
+        -9 is written for missing value (-99 for TE_*)
+        Temperatures have no sentinel -> -9 C is a real observation
+        Valid range of each column is given by its unit
+        (negative hhmm is a time of the day before, used by RN_*_TM)
+    '''
+    ranges = {
+        'm/s': (0, 75), 'm': (0, 100000), 'hhmm': (-2400, 2400), 'C': (-50, 60),
+        '%': (0, 100), 'hPa': (0, 1100), 'mm': (0, 2000), 'hr': (0, 24),
+        '1/10': (0, 10), 'MJ/m2': (0, 50), 'mm/h': (0, 500), 'cm': (0, 500)
+    }
+    spec = [
+        # name, dtype, sql type, unit, sentinel, description
+        ('TM', 'int64', 'DATE', 'KST', None, '관측일'),
+        ('STN', 'int64', 'INT', None, None, '국내 지점번호'),
+        ('WS_AVG', 'float64', 'FLOAT', 'm/s', -9.0, '일 평균 풍속'),
+        ('WR_DAY', 'int64', 'FLOAT', 'm', -9, '일 풍정'),
+        ('WD_MAX', 'int64', 'FLOAT', None, -9, '최대풍향'),
+        ('WS_MAX', 'float64', 'FLOAT', 'm/s', -9.0, '최대풍속'),
+        ('WS_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '최대풍속 시각'),
+        ('WD_INS', 'int64', 'FLOAT', None, -9, '최대순간풍향'),
+        ('WS_INS', 'float64', 'FLOAT', 'm/s', -9.0, '최대순간풍속'),
+        ('WS_INS_TM', 'int64', 'STRING', 'hhmm', -9, '최대순간풍속 시각'),
+        ('TA_AVG', 'float64', 'FLOAT', 'C', None, '일 평균기온'),
+        ('TA_MAX', 'float64', 'FLOAT', 'C', None, '최고기온'),
+        ('TA_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '최고기온 시각'),
+        ('TA_MIN', 'float64', 'FLOAT', 'C', None, '최저기온'),
+        ('TA_MIN_TM', 'int64', 'STRING', 'hhmm', -9, '최저기온 시각'),
+        ('TD_AVG', 'float64', 'FLOAT', 'C', None, '일 평균 이슬점온도'),
+        ('TS_AVG', 'float64', 'FLOAT', 'C', None, '일 평균 지면온도'),
+        ('TG_MIN', 'float64', 'FLOAT', 'C', None, '일 최저 초상온도'),
+        ('HM_AVG', 'float64', 'FLOAT', '%', -9.0, '일 평균 상대습도'),
+        ('HM_MIN', 'float64', 'FLOAT', '%', -9.0, '최저습도'),
+        ('HM_MIN_TM', 'int64', 'STRING', 'hhmm', -9, '최저습도 시각'),
+        ('PV_AVG', 'float64', 'FLOAT', 'hPa', -9.0, '일 평균 수증기압'),
+        ('EV_S', 'float64', 'FLOAT', 'mm', -9.0, '소형 증발량'),
+        ('EV_L', 'float64', 'FLOAT', 'mm', -9.0, '대형 증발량'),
+        ('FG_DUR', 'float64', 'FLOAT', 'hr', -9.0, '안개계속시간'),
+        ('PA_AVG', 'float64', 'FLOAT', 'hPa', -9.0, '일 평균 현지기압'),
+        ('PS_AVG', 'float64', 'FLOAT', 'hPa', -9.0, '일 평균 해면기압'),
+        ('PS_MAX', 'float64', 'FLOAT', 'hPa', -9.0, '최고 해면기압'),
+        ('PS_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '최고 해면기압 시각'),
+        ('PS_MIN', 'float64', 'FLOAT', 'hPa', -9.0, '최저 해면기압'),
+        ('PS_MIN_TM', 'int64', 'STRING', 'hhmm', -9, '최저 해면기압 시각'),
+        ('CA_TOT', 'float64', 'FLOAT', '1/10', -9.0, '일 평균 전운량'),
+        ('SS_DAY', 'float64', 'FLOAT', 'hr', -9.0, '일조합'),
+        ('SS_DUR', 'float64', 'FLOAT', 'hr', -9.0, '가조시간'),
+        ('SS_CMB', 'float64', 'FLOAT', 'hr', -9.0, '캄벨 일조'),
+        ('SI_DAY', 'float64', 'FLOAT', 'MJ/m2', -9.0, '일사합'),
+        ('SI_60M_MAX', 'float64', 'FLOAT', 'MJ/m2', -9.0, '최대 1시간일사'),
+        ('SI_60M_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '최대 1시간일사 시각'),
+        ('RN_DAY', 'float64', 'FLOAT', 'mm', -9.0, '일 강수량'),
+        ('RN_D99', 'float64', 'FLOAT', 'mm', -9.0, '9-9 강수량'),
+        ('RN_DUR', 'float64', 'FLOAT', 'hr', -9.0, '강수계속시간'),
+        ('RN_60M_MAX', 'float64', 'FLOAT', 'mm', -9.0, '1시간 최다강수량'),
+        ('RN_60M_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '1시간 최다강수량 시각'),
+        ('RN_10M_MAX', 'float64', 'FLOAT', 'mm', -9.0, '10분간 최다강수량'),
+        ('RN_10M_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '10분간 최다강수량 시각'),
+        ('RN_POW_MAX', 'float64', 'FLOAT', 'mm/h', -9.0, '최대 강우강도'),
+        ('RN_POW_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '최대 강우강도 시각'),
+        ('SD_NEW', 'float64', 'FLOAT', 'cm', -9.0, '최심 신적설'),
+        ('SD_NEW_TM', 'int64', 'STRING', 'hhmm', -9, '최심 신적설 시각'),
+        ('SD_MAX', 'float64', 'FLOAT', 'cm', -9.0, '최심 적설'),
+        ('SD_MAX_TM', 'int64', 'STRING', 'hhmm', -9, '최심 적설 시각'),
+        ('TE_05', 'float64', 'FLOAT', 'C', -99.0, '0.5m 지중온도'),
+        ('TE_10', 'float64', 'FLOAT', 'C', -99.0, '1.0m 지중온도'),
+        ('TE_15', 'float64', 'FLOAT', 'C', -99.0, '1.5m 지중온도'),
+        ('TE_30', 'float64', 'FLOAT', 'C', -99.0, '3.0m 지중온도'),
+        ('TE_50', 'float64', 'FLOAT', 'C', -99.0, '5.0m 지중온도')
+    ]
+    return [column(name, dtype, sql_type, unit, sentinel, desc=desc, valid_range=ranges.get(unit))
+            for name, dtype, sql_type, unit, sentinel, desc in spec]
+
+
+SCHEMAS = {
+    'SFC': dataset_schema(
+        'SFC', _sfc_columns(), key=['TM', 'STN'],
+        table='surface_kor', stage_file='merged_SFC.csv', date_format='YYYYMMDD'
+    ),
+    'marine': dataset_schema(
+        'marine', [
+            column('TM_KST', 'int64', 'DATE', 'KST', desc='관측시각'),
+            column('STN_ID', 'int64', 'INT', desc='지점 ID'),
+            column('STN_KO', 'str', 'STRING', desc='지점명'),
+            column('LON_deg', 'float64', 'FLOAT', 'degree', desc='경도', valid_range=(0, 180)),
+            column('LAT_deg', 'float64', 'FLOAT', 'degree', desc='위도', valid_range=(0, 90)),
+            column('WH_m', 'float64', 'FLOAT', 'm', -99.0, desc='유의파고', valid_range=(0, 30)),
+            column('WD_deg', 'int64', 'FLOAT', 'degree', -99, desc='풍향', valid_range=(0, 360)),
+            column('WS_m/s', 'float64', 'FLOAT', 'm/s', -99.0, desc='풍속', valid_range=(0, 75)),
+            column('WS_GST', 'float64', 'FLOAT', 'm/s', -99.0, desc='GUST 풍속', valid_range=(0, 100)),
+            column('TW_C', 'float64', 'FLOAT', 'C', -99.0, desc='해수면 온도', valid_range=(-5, 40)),
+            column('TA_C', 'float64', 'FLOAT', 'C', -99.0, desc='기온', valid_range=(-50, 60)),
+            column('PA_hPa', 'float64', 'FLOAT', 'hPa', -99.0, desc='해면기압', valid_range=(800, 1100)),
+            column('HM_%', 'float64', 'FLOAT', '%', -99.0, desc='상대습도', valid_range=(0, 100))
+        ],
+        key=['TM_KST', 'STN_ID'],
+        table='marine_kor', stage_file='merged_marine.csv', date_format='YYYYMMDD'
+    ),
+    'stn_SFC': dataset_schema(
+        'stn_SFC', [
+            column('STN_ID', 'int64', 'INT'),
+            column('LON_degee', 'float64', 'FLOAT', 'degree', sql_name='LON_DEGREE', valid_range=(0, 180)),
+            column('LAT_degree', 'float64', 'FLOAT', 'degree', valid_range=(0, 90)),
+            column('STN_SP', 'int64', 'STRING'),
+            column('HT_m', 'float64', 'FLOAT', 'm'),
+            column('HT_PA_m', 'float64', 'FLOAT', 'm'),
+            column('HT_TA_m', 'float64', 'FLOAT', 'm'),
+            column('HT_WD_m', 'float64', 'FLOAT', 'm'),
+            column('HT_RN_m', 'float64', 'FLOAT', 'm'),
+            column('STN_AD', 'int64', 'STRING'),
+            column('STN_KO', 'str', 'STRING'),
+            column('STN_EN', 'str', 'STRING'),
+            column('FCT_ID', 'str', 'STRING'),
+            column('LAW_ID', 'str', 'STRING')
+        ],
+        key=['STN_ID'],
+        table='station_surface_kor', stage_file='stn_SFC_info.csv'
+    ),
+    'stn_BUOY': dataset_schema(
+        'stn_BUOY', [
+            column('STN_ID', 'int64', 'INT'),
+            column('LON_degee', 'float64', 'FLOAT', 'degree', sql_name='LON_DEGREE', valid_range=(0, 180)),
+            column('LAT_degree', 'float64', 'FLOAT', 'degree', valid_range=(0, 90)),
+            column('STN_SP', 'int64', 'STRING'),
+            column('HT_m', 'float64', 'FLOAT', 'm'),
+            column('AD_ID', 'int64', 'STRING'),
+            column('STN_KO', 'str', 'STRING'),
+            column('STN_EN', 'str', 'STRING')
+        ],
+        key=['STN_ID'],
+        table='station_buoy_kor', stage_file='stn_BUOY_info.csv'
+    )
+}
+
+
+def get_schema(name):
+    '''
+        Schema of dataset by name (case insensitive), None if not registered
+        param :
+            name : SFC, marine, stn_SFC, stn_BUOY
+    '''
+    for key, schema in SCHEMAS.items():
+        if key.lower() == str(name).lower():
+            return schema
+    return None
@@ -1,17 +1,25 @@
-import snowflake.connector
-import os
+import os, argparse
 from datetime import datetime
 from dotenv import load_dotenv
+from tracing import tracer
+from schema_registry import SCHEMAS
+from warehouse_backend import get_backend
 
 class snowflake_controller:
 
 
-    def __init__(self):
+    def __init__(self, backend=None, interactive=True):
+        '''
+            param :
+                backend : warehouse backend name (snowflake, duckdb)
+                    if None -> WAREHOUSE_BACKEND in .env (default snowflake)
+                interactive : if True -> enter SQL prompt after connecting
+        '''
 
         load_dotenv()
 
         # Log path
-        self.log_dir = os.getenv('LOG_HISTORY')
+        self.log_dir = os.getenv('LOG_HISTORY', 'logs')
         os.makedirs(self.log_dir, exist_ok=True)
         today_str = datetime.now().strftime('%Y%m%d')
         self.log_file = os.path.join(self.log_dir, f"{today_str}.txt")
@@ -19,6 +27,7 @@ class snowflake_controller:
         # Mapping methods for easy access
         self.command_map = {
             'station_surface_kor' : self.station_surface_kor,
+            'station_buoy_kor' : self.station_buoy_kor,
             'surface_kor' : self.surface_kor,
             'marine_kor' : self.marine_kor,
             'surface_kor_daily_analytics' : self.surface_kor_daily_analytics,
@@ -34,62 +43,23 @@ class snowflake_controller:
         else:
             print('Log data file already created')
 
-        # Connecting to redshift 
-        self.conn = snowflake.connector.connect(
-            user=os.getenv('SNOWFLAKE_USER'),
-            password=os.getenv('SNOWFLAKE_PASSWORD'),
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA')
-        )
-
-        # Debug : To see connected to redshift -> show current db and access user
-        self.cursor = self.conn.cursor()
-
-        # Check Stage -> create Stage
-        self.ensure_stage_exists()
-
-        print('Connected to Snowflake')
-
-        self.save_log(f'just connected to snowflake sever at db')
+        # Connecting to warehouse (Snowflake or local DuckDB)
+        self.backend = get_backend(backend, self.save_log)
+        with tracer.span('snowflake_controller.connect', backend=self.backend.name):
+            self.backend.connect()
+        self.conn = self.backend.conn
+        self.cursor = self.backend.cursor
 
+        # Check Stage -> create Stage (Snowflake) / schemas (DuckDB)
+        self.backend.prepare()
 
-        self.run_querry()
+        print(f'Connected to {self.backend.name}')
 
+        self.save_log(f'just connected to {self.backend.name} sever at db')
 
-    def ensure_stage_exists(self):
-        """
-            Check if Stage already exists in Snowflake; if not, create one.
-        """
-        try:
-            stage_check = '''
-                SHOW STAGES LIKE 'my_s3_stage';
-            '''
-            self.cursor.execute(stage_check)
-            result = self.cursor.fetchall()
-
-            if len(result) == 0:
-                print('Stage Not Found -> Creating new stage \'my_s3_stage\'')
-                stage_sql = f'''
-                    CREATE OR REPLACE STAGE RAW_DATA.MY_S3_STAGE
-                    URL='s3://{os.getenv("AWS_BUCKET")}/raw/'
-                    CREDENTIALS=(
-                        AWS_KEY_ID='{os.getenv("AWS_KEY")}'
-                        AWS_SECRET_KEY='{os.getenv("AWS_SECRETE_KEY")}'
-                    )
-                    FILE_FORMAT=(TYPE=CSV FIELD_OPTIONALLY_ENCLOSED_BY='"' SKIP_HEADER=1);
-                '''
-                self.cursor.execute(stage_sql)
-                print("Stage 'my_s3_stage' created successfully")
-                self.save_log("Stage 'my_s3_stage' created successfully")
-            else:
-                print("Stage 'my_s3_stage' already exists (skipped creation)")
-                self.save_log("Stage 'my_s3_stage' already exists")
 
-        except Exception as e:
-            print(f"Error verifying/creating stage: {e}")
-            self.save_log(f"Error verifying/creating stage: {e}")
+        if interactive:
+            self.run_querry()
 
 
     def save_log(self, history):
@@ -120,85 +90,93 @@ class snowflake_controller:
             if command in self.command_map:
                 print(f'Calling Function : {command}')
                 self.save_log(f'Function {command} has been called')
-                try:
-                    self.command_map[command]() # Run called function
-                except Exception as e:
-                    print(f'Error Running {command} : {e}')
-                    self.save_log(f'Error in {command} : {e}')
+                with tracer.span(f'snowflake_controller.{command}') as span:
+                    try:
+                        self.command_map[command]() # Run called function
+                    except Exception as e:
+                        span.fail(e)
+                        print(f'Error Running {command} : {e}')
+                        self.save_log(f'Error in {command} : {e}')
                 continue
             
-            try:
-
-                # Execute Querry
-                start_ts = datetime.now()
-                self.cursor.execute(command)
-                elapsed = (datetime.now() - start_ts).total_seconds()
-
-
-                # SELECT query output
-                if command.strip().lower().startswith("select"):
-                    # Fetch if there is meta data
-                    rows = self.cursor.fetchall()
-                    if rows:
-                        for row in rows:
-                            print(row)
-                        print(f"{len(rows)} rows returned ({elapsed:.3f}s)")
-                    else :
-                        print("No result set returned")
-                    self.save_log(f"SUCCESS (SELECT) [{elapsed:.3f}s]: {command}")
-
-                else:
-                    # 3) DDL/DML Commit
-                    print(f"Query executed successfully (committed in {elapsed:.3f}s)")
-                    self.save_log(f"SUCCESS (DDL/DML) [{elapsed:.3f}s]: {command}")
-
-            except Exception as e:
-                print(f'Error Raised : {e}')
-                self.save_log(f'Error Detected : {e} ({command})')
-
-        self.cursor.close()
-        self.conn.close()
+            with tracer.span('snowflake_controller.query', sql=command[:200]) as span:
+                try:
+
+                    # Execute Querry
+                    start_ts = datetime.now()
+                    self.cursor.execute(command)
+                    elapsed = (datetime.now() - start_ts).total_seconds()
+
+
+                    # SELECT query output
+                    if command.strip().lower().startswith("select"):
+                        # Fetch if there is meta data
+                        rows = self.cursor.fetchall()
+                        span.add('rows', len(rows))
+                        if rows:
+                            for row in rows:
+                                print(row)
+                            print(f"{len(rows)} rows returned ({elapsed:.3f}s)")
+                        else :
+                            print("No result set returned")
+                        self.save_log(f"SUCCESS (SELECT) [{elapsed:.3f}s]: {command}")
+
+                    else:
+                        # 3) DDL/DML Commit
+                        span.add('rows', max(getattr(self.cursor, 'rowcount', 0) or 0, 0))
+                        print(f"Query executed successfully (committed in {elapsed:.3f}s)")
+                        self.save_log(f"SUCCESS (DDL/DML) [{elapsed:.3f}s]: {command}")
+
+                except Exception as e:
+                    span.fail(e)
+                    print(f'Error Raised : {e}')
+                    self.save_log(f'Error Detected : {e} ({command})')
+
+        self.backend.close()
         print('Connection closed')
 
 
+    def report_load(self, schema, results):
+        '''
+            Print and log rows rejected in each loaded file
+            COPY runs with ON_ERROR='CONTINUE' -> bad rows are skipped without error,
+            so they are only found in the result of COPY
+
+            param :
+                schema : dataset_schema of the loaded table
+                results : load result of each file from backend.load_table
+        '''
+        span = tracer.current()
+        rejected = 0
+        for result in results:
+            message = (f"{schema.table} <- {os.path.basename(result['file'])} : "
+                       f"{result['rows_loaded']} / {result['rows_parsed']} rows loaded, "
+                       f"{result['rejected']} rejected")
+            if result['rejected']:
+                message += f" (first error : {result['first_error']})"
+                print(message)
+            self.save_log(message)
+            rejected += result['rejected']
+            if span:
+                span.add('rows', result['rows_loaded'])
+
+        print(f'{schema.table} : {rejected} rows rejected from {len(results)} files')
+        if span:
+            span.set(rejected=rejected)
+
+
     def station_surface_kor(self):
         '''
             Create the table raw_data.station_surface_kor if not exists,
-            copy from S3 called stn_SFC_info.csv
+            copy from stn_SFC_info.csv (direct load if file is small, else S3)
         '''
-        create_sql = """
-            CREATE OR REPLACE TABLE RAW_DATA.station_surface_kor (
-                stn_id INT,
-                lon_degree FLOAT,
-                lat_degree FLOAT,
-                stn_sp STRING,
-                ht_m FLOAT,
-                ht_pa_m FLOAT,
-                ht_ta_m FLOAT,
-                ht_wd_m FLOAT,
-                ht_rn_m FLOAT,
-                stn_ad STRING,
-                stn_ko STRING,
-                stn_en STRING,
-                fct_id STRING,
-                law_id STRING
-            );
-        """
         try:
-            self.cursor.execute(create_sql)
+            # DDL and load are generated from schema registry by the backend
+            results = self.backend.load_table(SCHEMAS['stn_SFC'])
+            self.report_load(SCHEMAS['stn_SFC'], results)
             print('The station_surface_kor data created!')
             self.save_log('The raw_data.station_surface_kor table created')
 
-            # Copy from S3
-            copy_sql = f'''
-                COPY INTO RAW_DATA.station_surface_kor
-                FROM @my_s3_stage/stn_SFC_info.csv
-                FILE_FORMAT=(TYPE=CSV FIELD_OPTIONALLY_ENCLOSED_BY='"' SKIP_HEADER=1)
-                ON_ERROR='CONTINUE';
-            '''
-
-            self.cursor.execute(copy_sql)
-
             print("Data copied → RAW_DATA.station_surface_kor")
             self.save_log("station_surface_kor table created and data copied")
 
@@ -208,89 +186,40 @@ class snowflake_controller:
             self.save_log('Error creating table: {e}')
 
 
+    def station_buoy_kor(self):
+        '''
+            Create the table raw_data.station_buoy_kor if not exists,
+            copy from stn_BUOY_info.csv (direct load if file is small, else S3)
+        '''
+        try:
+            # DDL and load are generated from schema registry by the backend
+            results = self.backend.load_table(SCHEMAS['stn_BUOY'])
+            self.report_load(SCHEMAS['stn_BUOY'], results)
+            print('The station_buoy_kor data created!')
+            self.save_log('The raw_data.station_buoy_kor table created')
+
+            print("Data copied → RAW_DATA.station_buoy_kor")
+            self.save_log("station_buoy_kor table created and data copied")
+
+
+        except Exception as e:
+            print(f'Error Creating Table : {e}')
+            self.save_log(f'Error creating table: {e}')
+
+
     def surface_kor(self):
         '''
             Create the table raw_data.surface_kor if not exists,
             copy from S3 called merged_SFC.csv
         '''
         try:
-            create_sql = """
-                CREATE OR REPLACE TABLE RAW_DATA.surface_kor (
-                    TM DATE,
-                    STN INT,
-                    WS_AVG FLOAT,
-                    WR_DAY FLOAT,
-                    WD_MAX FLOAT,
-                    WS_MAX FLOAT,
-                    WS_MAX_TM STRING,
-                    WD_INS FLOAT,
-                    WS_INS FLOAT,
-                    WS_INS_TM STRING,
-                    TA_AVG FLOAT,
-                    TA_MAX FLOAT,
-                    TA_MAX_TM STRING,
-                    TA_MIN FLOAT,
-                    TA_MIN_TM STRING,
-                    TD_AVG FLOAT,
-                    TS_AVG FLOAT,
-                    TG_MIN FLOAT,
-                    HM_AVG FLOAT,
-                    HM_MIN FLOAT,
-                    HM_MIN_TM STRING,
-                    PV_AVG FLOAT,
-                    EV_S FLOAT,
-                    EV_L FLOAT,
-                    FG_DUR FLOAT,
-                    PA_AVG FLOAT,
-                    PS_AVG FLOAT,
-                    PS_MAX FLOAT,
-                    PS_MAX_TM STRING,
-                    PS_MIN FLOAT,
-                    PS_MIN_TM STRING,
-                    CA_TOT FLOAT,
-                    SS_DAY FLOAT,
-                    SS_DUR FLOAT,
-                    SS_CMB FLOAT,
-                    SI_DAY FLOAT,
-                    SI_60M_MAX FLOAT,
-                    SI_60M_MAX_TM STRING,
-                    RN_DAY FLOAT,
-                    RN_D99 FLOAT,
-                    RN_DUR FLOAT,
-                    RN_60M_MAX FLOAT,
-                    RN_60M_MAX_TM STRING,
-                    RN_10M_MAX FLOAT,
-                    RN_10M_MAX_TM STRING,
-                    RN_POW_MAX FLOAT,
-                    RN_POW_MAX_TM STRING,
-                    SD_NEW FLOAT,
-                    SD_NEW_TM STRING,
-                    SD_MAX FLOAT,
-                    SD_MAX_TM STRING,
-                    TE_05 FLOAT,
-                    TE_10 FLOAT,
-                    TE_15 FLOAT,
-                    TE_30 FLOAT,
-                    TE_50 FLOAT
-                );
-            """
-            self.cursor.execute(create_sql)
+            # DDL and load are generated from schema registry by the backend
+            results = self.backend.load_table(SCHEMAS['SFC'])
+            self.report_load(SCHEMAS['SFC'], results)
 
             print('The surface_kor data created!')
             self.save_log('THE raw_data.surface_kor table created')
 
-            # Copy from S3
-            copy_sql = """
-                COPY INTO RAW_DATA.surface_kor
-                FROM @my_s3_stage/merged_SFC.csv
-                FILE_FORMAT=(TYPE=CSV 
-                FIELD_OPTIONALLY_ENCLOSED_BY='"' 
-                SKIP_HEADER=1
-                DATE_FORMAT = YYYYMMDD)
-                ON_ERROR='CONTINUE';
-            """
-
-            self.cursor.execute(copy_sql)
             print("Data copied → RAW_DATA.surface_kor")
             self.save_log("surface_kor table created and data copied")
 
@@ -306,41 +235,13 @@ class snowflake_controller:
             copy from S3 called merged_marine.csv
         '''
         try:
-            create_sql = """
-                CREATE OR REPLACE TABLE RAW_DATA.marine_kor (
-                    TM_KST DATE,
-                    STN_ID INT,
-                    STN_KO STRING,
-                    LON_DEG FLOAT,
-                    LAT_DEG FLOAT,
-                    WH_M FLOAT,
-                    WD_DEG FLOAT,
-                    WS_M_S FLOAT,
-                    WS_GST FLOAT,
-                    TW_C FLOAT,
-                    TA_C FLOAT,
-                    PA_HPA FLOAT,
-                    HM_PERCENT FLOAT
-                );
-            """
-            self.cursor.execute(create_sql)
+            # DDL and load are generated from schema registry by the backend
+            results = self.backend.load_table(SCHEMAS['marine'])
+            self.report_load(SCHEMAS['marine'], results)
 
             print('The marine_kor data created!')
             self.save_log('THE raw_data.marine_kor table created')
 
-            # Copy from S3
-            copy_sql = """
-                COPY INTO RAW_DATA.marine_kor
-                FROM @my_s3_stage/merged_marine.csv
-                FILE_FORMAT=(TYPE=CSV 
-                FIELD_OPTIONALLY_ENCLOSED_BY='"' 
-                SKIP_HEADER=1
-                DATE_FORMAT = YYYYMMDD)
-                ON_ERROR='CONTINUE';
-            """
-
-            self.cursor.execute(copy_sql)
-
             print("Data copied → RAW_DATA.marine_kor")
             self.save_log("marine_kor table created and data copied")
 
@@ -460,4 +361,9 @@ class snowflake_controller:
 
 
 if __name__ == '__main__':
-    snowflake_controller()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='SQL prompt on the warehouse')
+    parser.add_argument('--backend', default=None, help='snowflake or duckdb (default WAREHOUSE_BACKEND)')
+    args = parser.parse_args()
+
+    snowflake_controller(args.backend)
+    tracer.finish()
\ No newline at end of file
@@ -0,0 +1,288 @@
+import os, json, argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from tracing import tracer
+from schema_registry import get_schema
+
+
+class station_store:
+    '''
+        Columnar station x day store built from the daily files
+        One memory-mapped array (.npy) per variable, shape (day, station slot),
+        float32 with NaN for missing value (sentinels are stored as NaN)
+
+            data/store/{type}/meta.json   -> first day, stations of each slot, merged files
+            data/store/{type}/{var}.npy   -> values of variable
+
+        Opening reads only meta.json -> arrays are mapped on first access
+        value(var, day, stn) is O(1), day() is a contiguous row and series() is a
+        strided column view of the mapped file (no copy)
+        Arrays keep spare days / slots so that refresh() appends in place
+
+        param :
+            path : folder of store (STORE_DIR/{type} if None)
+            type : dataset name (SFC, marine)
+    '''
+
+    DTYPE = np.float32
+
+    def __init__(self, path=None, type='SFC'):
+        load_dotenv()
+        self.path = path if path else os.path.join(os.getenv('STORE_DIR', 'data/store'), type)
+        self.type = type
+        self.schema = get_schema(type)
+        self.arrays = {}
+
+        meta_path = os.path.join(self.path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = None
+        self.slots = {stn: slot for slot, stn in enumerate(self.meta['stations'])} if self.meta else {}
+
+
+    @property
+    def variables(self):
+        '''
+            Numeric columns of dataset except the key (day and station are the index)
+        '''
+        return [col.name for col in self.schema.columns
+                if col.dtype != 'str' and col.name not in self.schema.key]
+
+
+    @property
+    def start(self):
+        return datetime.strptime(self.meta['start'], '%Y%m%d')
+
+
+    @property
+    def days(self):
+        return self.meta['days']
+
+
+    @property
+    def stations(self):
+        return list(self.meta['stations'])
+
+
+    @property
+    def dates(self):
+        '''
+            Date of each day offset (datetime64[D])
+        '''
+        return np.datetime64(self.start, 'D') + np.arange(self.days)
+
+
+    def file_name(self, var):
+        # variable name into file name (ex - WS_m/s -> WS_m_s.npy)
+        return os.path.join(self.path, var.replace('/', '_').replace('%', 'PERCENT') + '.npy')
+
+
+    def array(self, var, mode='r'):
+        '''
+            Memory-mapped array of variable, only used rows of (day, slot)
+        '''
+        if var not in self.arrays or (mode == 'r+' and not self.arrays[var][1]):
+            mapped = np.load(self.file_name(var), mmap_mode=mode)
+            self.arrays[var] = (mapped, mode == 'r+')
+        return self.arrays[var][0][:self.days, :len(self.meta['stations'])]
+
+
+    def offset(self, day):
+        '''
+            Day offset of date (yyyymmdd str / int or datetime)
+        '''
+        if not isinstance(day, datetime):
+            day = datetime.strptime(str(day)[:8], '%Y%m%d')
+        return (day - self.start).days
+
+
+    def value(self, var, day, stn):
+        '''
+            Value of one station on one day -> O(1), NaN if missing
+        '''
+        slot = self.slots.get(int(stn))
+        offset = self.offset(day)
+        if slot is None or not 0 <= offset < self.days:
+            return np.nan
+        return float(self.array(var)[offset, slot])
+
+
+    def day(self, var, day):
+        '''
+            Values of all stations on one day (view, ordered as self.stations)
+            KeyError if the day is outside the store
+        '''
+        offset = self.offset(day)
+        if not 0 <= offset < self.days:
+            last = self.start + timedelta(days=self.days - 1)
+            raise KeyError(f'{day} is outside {self.type} store ({self.meta["start"]} ~ {last:%Y%m%d})')
+        return self.array(var)[offset]
+
+
+    def series(self, var, stn, start=None, end=None):
+        '''
+            Values of one station for every day (view, dates from self.dates)
+            param :
+                start, end : range of date (yyyymmdd, end included), None -> all days
+        '''
+        first = max(self.offset(start), 0) if start else 0
+        last = self.offset(end) + 1 if end else self.days
+        return self.array(var)[first:last, self.slots[int(stn)]]
+
+
+    def frame(self, var, start=None, end=None):
+        '''
+            Data frame of variable (index date, column station) -> copy of the range
+        '''
+        first = max(self.offset(start), 0) if start else 0
+        last = self.offset(end) + 1 if end else self.days
+        return pd.DataFrame(self.array(var)[first:last], index=self.dates[first:last],
+                            columns=self.meta['stations'])
+
+
+    def grow(self, days, stations):
+        '''
+            Make arrays large enough for (days, stations)
+            Capacity is doubled -> files are rewritten only a few times while appending
+        '''
+        capacity = self.meta['capacity']
+        if days <= capacity[0] and stations <= capacity[1]:
+            return
+
+        new_capacity = [max(days, capacity[0] * 2) if days > capacity[0] else capacity[0],
+                        max(stations, capacity[1] * 2) if stations > capacity[1] else capacity[1]]
+        self.arrays = {}
+        for var in self.variables:
+            path = self.file_name(var)
+            old = np.load(path, mmap_mode='r')
+            new = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=self.DTYPE,
+                                            shape=tuple(new_capacity))
+            new[:] = np.nan
+            new[:old.shape[0], :old.shape[1]] = old
+            new.flush()
+            del old, new
+            os.replace(path + '.tmp', path)
+        self.meta['capacity'] = new_capacity
+
+
+    def create(self, first_day, days, stations):
+        '''
+            Empty store starting at first_day with spare capacity (1 year, 16 stations)
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        capacity = [days + 366, stations + 16]
+        for var in self.variables:
+            array = np.lib.format.open_memmap(self.file_name(var), mode='w+', dtype=self.DTYPE,
+                                              shape=tuple(capacity))
+            array[:] = np.nan
+            array.flush()
+            del array
+
+        self.meta = {'type': self.type, 'start': first_day, 'days': 0, 'stations': [],
+                     'capacity': capacity, 'files': []}
+        self.slots = {}
+        self.arrays = {}
+
+
+    def save_meta(self):
+        '''
+            meta.json is written last (temp file then replace) -> if refresh stops in the middle,
+            the files are not recorded and are written again on next refresh
+        '''
+        for mapped, writable in self.arrays.values():
+            if writable:
+                mapped.flush()
+
+        meta_path = os.path.join(self.path, 'meta.json')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+
+    def refresh(self, path, rebuild=False):
+        '''
+            Add the daily files not in the store yet
+            param :
+                path : folder of daily files
+                rebuild : if True -> store is made again from all files
+            Returns number of files added
+        '''
+        with tracer.span('station_store.refresh', type=self.type, rebuild=rebuild) as span:
+            csv_files = sorted(file for file in os.listdir(path) if file.endswith('.csv'))
+            if self.meta and not rebuild:
+                stored = set(self.meta['files'])
+                csv_files = [file for file in csv_files if file not in stored]
+                # day before the first day of store -> offsets change, so build again
+                if csv_files and csv_files[0][:8] < self.meta['start']:
+                    return self.refresh(path, rebuild=True)
+
+            if not csv_files:
+                print(f'{self.type} store is up to date ({self.days} days)')
+                return 0
+
+            file_paths = [os.path.join(path, file) for file in csv_files]
+            span.add('bytes_in', sum(os.path.getsize(file_path) for file_path in file_paths))
+            df = self.schema.read_many(file_paths)
+
+            date_col, stn_col = self.schema.key
+            tm = df[date_col].to_numpy()
+            days = pd.to_datetime(np.where(tm >= 10**11, tm // 10000, tm).astype(str), format='%Y%m%d')
+            stns = df[stn_col].to_numpy()
+
+            if self.meta is None or rebuild:
+                self.create(days.min().strftime('%Y%m%d'), (days.max() - days.min()).days + 1,
+                            len(np.unique(stns)))
+
+            # new stations get the next slots
+            for stn in pd.unique(stns):
+                if int(stn) not in self.slots:
+                    self.slots[int(stn)] = len(self.meta['stations'])
+                    self.meta['stations'].append(int(stn))
+
+            offsets = (days - pd.Timestamp(self.start)).days.to_numpy()
+            slots = np.array([self.slots[int(stn)] for stn in stns], dtype=np.int64)
+            total_days = max(self.days, int(offsets.max()) + 1)
+            self.grow(total_days, len(self.meta['stations']))
+            self.meta['days'] = total_days
+
+            # one fancy assignment per variable -> later file wins for same (day, station)
+            for var in self.variables:
+                values = df[var].to_numpy(dtype='float64')
+                sentinel = self.schema.by_name[var].sentinel
+                if sentinel is not None:
+                    values = np.where(values == sentinel, np.nan, values)
+                self.array(var, mode='r+')[offsets, slots] = values
+
+            self.meta['files'].extend(csv_files)
+            self.save_meta()
+
+            span.add('rows', len(df))
+            span.add('bytes_out', sum(os.path.getsize(self.file_name(var)) for var in self.variables))
+            print(f'{self.type} store : {len(csv_files)} files added -> '
+                  f'{self.days} days x {len(self.meta["stations"])} stations')
+            return len(csv_files)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Build / refresh station x day store from daily files')
+    parser.add_argument('--type', default='SFC', choices=['SFC', 'marine'])
+    parser.add_argument('--rebuild', action='store_true', help='build again from all daily files')
+    parser.add_argument('--stn', type=int, help='print series of station after refresh')
+    parser.add_argument('--var', default='TA_AVG', help='variable printed with --stn')
+    args = parser.parse_args()
+
+    folders = {
+        'SFC': os.getenv('FILES_PATH_weather', 'data/weather_condition'),
+        'marine': os.getenv('FILES_PATH_marine', 'data/marine_condition')
+    }
+    store = station_store(type=args.type)
+    store.refresh(folders[args.type], rebuild=args.rebuild)
+
+    if args.stn:
+        print(pd.Series(store.series(args.var, args.stn), index=store.dates, name=args.var).dropna())
+    tracer.finish()
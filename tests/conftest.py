@@ -0,0 +1,23 @@
+import os, sys
+import pytest
+
+# modules live at the top of the repo -> importable from tests
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WEATHER_DIR = os.path.join(ROOT, 'data', 'weather_condition')
+MARINE_DIR = os.path.join(ROOT, 'data', 'marine_condition')
+
+
+@pytest.fixture(autouse=True)
+def local_paths(tmp_path, monkeypatch):
+    '''
+        Files written by the modules go into tmp_path -> data/ of repo is never changed
+    '''
+    monkeypatch.setenv('RAW_ARCHIVE_DIR', str(tmp_path / 'raw_archive'))
+    monkeypatch.setenv('QUARANTINE_DIR', str(tmp_path / 'quarantine'))
+    monkeypatch.setenv('STN_CACHE_PATH', str(tmp_path / 'stn_cache.json'))
+    monkeypatch.setenv('METRICS_PATH', str(tmp_path / 'daemon_metrics.json'))
+    monkeypatch.setenv('TRACE_DIR', str(tmp_path / 'trace'))
+    monkeypatch.setenv('REPARSE_DIR', str(tmp_path / 'reparse'))
+    return tmp_path
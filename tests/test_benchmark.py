@@ -0,0 +1,36 @@
+import json
+import pytest
+
+from benchmark import compare
+
+
+def result(tmp_path, name, medians):
+    path = tmp_path / f'{name}.json'
+    path.write_text(json.dumps({'results': [{'name': case, 'median_s': median}
+                                            for case, median in medians.items()]}), encoding='utf-8')
+    return str(path)
+
+
+def test_slow_down_is_flagged_and_speed_up_is_not(tmp_path):
+    baseline = result(tmp_path, 'base', {'parse': 1.0, 'merge': 2.0, 'upload': 0.5})
+    current = result(tmp_path, 'now', {'parse': 1.5, 'merge': 1.0, 'upload': 0.5})
+    assert compare(current, baseline) == ['parse']
+
+
+@pytest.mark.parametrize('now, threshold, regressed', [
+    (5.0, 0.25, False),     # exactly the allowed ratio -> not a regression
+    (5.01, 0.25, True),
+    (4.3, 0.05, True),
+    (4.3, 0.10, False)
+])
+def test_threshold_is_ratio_of_baseline(tmp_path, now, threshold, regressed):
+    baseline = result(tmp_path, 'base', {'merge': 4.0})
+    current = result(tmp_path, 'now', {'merge': now})
+    assert compare(current, baseline, threshold) == (['merge'] if regressed else [])
+
+
+def test_case_missing_from_baseline_is_not_flagged(tmp_path):
+    baseline = {'results': [{'name': 'parse', 'median_s': 1.0}, {'name': 'dropped', 'median_s': 1.0}]}
+    current = {'results': [{'name': 'parse', 'median_s': 1.0}, {'name': 'analytics', 'median_s': 9.0}]}
+    assert compare(current, baseline) == []
+
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_merge import csv_merge
+from key_index import key_index
+from schema_registry import SCHEMAS
+
+NAMES = SCHEMAS['marine'].names
+
+
+def write_day(folder, name, rows):
+    '''
+        Daily marine file of (TM_KST, STN_ID, WH_m) rows, the other columns filled
+    '''
+    values = {**{col: 1 for col in NAMES}, 'STN_KO': 'x', 'LON_deg': 126.5, 'LAT_deg': 35.1, 'PA_hPa': 1012.0}
+    df = pd.DataFrame([{**values, 'TM_KST': tm, 'STN_ID': stn, 'WH_m': wh}
+                       for tm, stn, wh in rows], columns=NAMES)
+    df.to_csv(os.path.join(folder, name), index=False)
+
+
+@pytest.fixture
+def days(tmp_path):
+    folder = tmp_path / 'days'
+    folder.mkdir()
+    write_day(folder, '202501011400.csv', [(202501011400, 1, 0.5), (202501011400, 2, 0.6)])
+    return folder
+
+
+def merged(out_path):
+    return pd.read_csv(out_path).set_index('STN_ID')['WH_m'].to_dict()
+
+
+@pytest.mark.parametrize('policy, expected', [('last', {1: 0.9, 2: 0.6, 3: 0.7}),
+                                              ('first', {1: 0.5, 2: 0.6, 3: 0.7})])
+def test_incremental_dedup_policy(days, tmp_path, policy, expected):
+    out_path = str(tmp_path / 'merged_marine.csv')
+    merger = csv_merge()
+    assert merger.merge(str(days), 'marine', out_path=out_path, policy=policy) == 0
+
+    # same day (TM_KST is cut into yyyymmdd -> one snapshot per station-day) and station 1 again
+    write_day(days, '202501011500.csv', [(202501011500, 1, 0.9), (202501011500, 3, 0.7)])
+    assert merger.merge(str(days), 'marine', incremental=True, out_path=out_path, policy=policy) == 1
+
+    assert merged(out_path) == expected
+    assert len(pd.read_csv(out_path)) == 3
+    assert len(key_index(out_path[:-4] + '.keys.npy')) == 3
+
+
+def test_failed_rewrite_keeps_merged_csv(days, tmp_path, monkeypatch):
+    out_path = str(tmp_path / 'merged_marine.csv')
+    merger = csv_merge()
+    merger.merge(str(days), 'marine', out_path=out_path)
+    with open(out_path, 'rb') as f:
+        before = f.read()
+
+    write_day(days, '202501011500.csv', [(202501011500, 1, 0.9)])
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(pd.DataFrame, 'reindex', fail)
+    with pytest.raises(OSError):
+        merger.merge(str(days), 'marine', incremental=True, out_path=out_path)
+
+    with open(out_path, 'rb') as f:
+        assert f.read() == before
+    assert not os.path.exists(out_path + '.tmp')
+
+
+def test_key_index_add_keeps_sorted_unique():
+    index = key_index(None)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        index.add(rng.integers(0, 1000, 200).astype(np.uint64))
+    assert np.all(np.diff(index.keys.astype(np.int64)) > 0)
+    assert index.contains(index.keys).all()
+    assert not index.contains(np.array([5000], dtype=np.uint64)).any()
@@ -0,0 +1,111 @@
+import os, shutil
+import pandas as pd
+import pytest
+
+from conftest import WEATHER_DIR
+from csv_merge import csv_merge
+from data_validator import data_validator
+
+DAYS = ['20251020', '20251021', '20251022', '20251023', '20251024', '20251025']
+
+
+@pytest.fixture
+def days(tmp_path):
+    folder = tmp_path / 'weather'
+    folder.mkdir()
+    for day in DAYS:
+        shutil.copy(os.path.join(WEATHER_DIR, f'{day}.csv'), folder / f'{day}.csv')
+    return folder
+
+
+def truncate(path, rows):
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    df.head(rows).to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def test_single_truncated_day_fails_coverage(days):
+    truncate(days / '20251025.csv', 10)
+    [report] = data_validator().validate([str(days / '20251025.csv')], 'SFC')
+    assert not report['ok']
+    assert report['coverage'] < 0.5 and 'stations' in report['errors'][0]
+
+    # a full day checked alone passes against the stored days
+    [report] = data_validator().validate([str(days / '20251024.csv')], 'SFC')
+    assert report['ok'] and report['coverage'] > 0.9
+
+
+def test_station_list_is_baseline_without_stored_days(days, tmp_path):
+    alone = tmp_path / 'alone'
+    alone.mkdir()
+    shutil.move(days / '20251025.csv', alone / '20251025.csv')
+    truncate(alone / '20251025.csv', 10)
+    [report] = data_validator().validate([str(alone / '20251025.csv')], 'SFC')
+    assert not report['ok']
+
+
+def test_merge_quarantines_bad_daily_file(days, tmp_path):
+    truncate(days / '20251023.csv', 10)
+    out_path = str(tmp_path / 'merged_SFC.csv')
+    csv_merge().merge(str(days), 'SFC', out_path=out_path)
+
+    quarantined = tmp_path / 'quarantine' / 'SFC'
+    assert sorted(os.listdir(quarantined)) == ['20251023.csv', '20251023.csv.json']
+    assert not (days / '20251023.csv').exists()
+    merged = pd.read_csv(out_path)
+    assert sorted(merged['TM'].astype(str).unique()) == [day for day in DAYS if day != '20251023']
+
+
+def test_failed_merged_file_is_kept(days, tmp_path, monkeypatch):
+    out_path = str(tmp_path / 'merged_SFC.csv')
+    csv_merge().merge(str(days), 'SFC', out_path=out_path)
+
+    # one day of merged csv cut down to 10 stations
+    df = pd.read_csv(out_path, dtype=str, keep_default_na=False)
+    df = df[(df['TM'] != '20251022') | (df.groupby('TM').cumcount() < 10)]
+    df.to_csv(out_path, index=False)
+
+    assert not data_validator().check(out_path, 'SFC')
+    assert os.path.exists(out_path)
+    assert not os.path.exists(tmp_path / 'quarantine')
+
+    from load_into_s3 import load_into_s3
+    uploaded = []
+    monkeypatch.setenv('MERGED_FILE_SFC_PATH', out_path)
+    monkeypatch.setattr(load_into_s3, 'load', lambda self, client, dir, s3_loc: uploaded.append(dir))
+    load_into_s3(files=[out_path])
+    assert uploaded == [] and os.path.exists(out_path)
+
+
+def test_empty_float_cell_passes_validate_and_merge(days, tmp_path):
+    path = days / '20251025.csv'
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    df.loc[0, 'TA_AVG'] = ''
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+
+    [report] = data_validator().validate([str(path)], 'SFC')
+    assert report['ok']
+
+    out_path = str(tmp_path / 'merged_SFC.csv')
+    csv_merge().merge(str(days), 'SFC', out_path=out_path)
+    merged = pd.read_csv(out_path, dtype=str, keep_default_na=False)
+    row = merged[(merged['TM'] == '20251025') & (merged['STN'] == df.loc[0, 'STN'])]
+    assert row['TA_AVG'].tolist() == ['']
+    assert len(merged) == sum(len(pd.read_csv(days / f'{day}.csv', encoding='utf-8-sig')) for day in DAYS)
+
+
+def test_quoted_comma_is_one_field(tmp_path):
+    df = pd.read_csv(os.path.join(os.path.dirname(WEATHER_DIR), 'stn_BUOY_info.csv'), dtype=str,
+                     keep_default_na=False, encoding='utf-8-sig')
+    df.loc[0, 'STN_EN'] = 'Ulleung, East'
+    path = tmp_path / 'stn_BUOY_info.csv'
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    assert '"Ulleung, East"' in path.read_text(encoding='utf-8-sig')
+
+    [report] = data_validator().validate([str(path)], 'stn_BUOY')
+    assert report['ok'] and report['rows'] == len(df)
+
+    # unquoted extra field is still a wrong row
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(','.join(df.iloc[1]) + ',extra\n')
+    [report] = data_validator().validate([str(path)], 'stn_BUOY')
+    assert report['errors'] == ['1 lines with wrong number of columns']
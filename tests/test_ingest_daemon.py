@@ -0,0 +1,177 @@
+import os, json, shutil
+from datetime import datetime
+import pandas as pd
+import pytest
+
+from conftest import ROOT, WEATHER_DIR, MARINE_DIR
+from mock_kma_server import mock_kma_server
+import ingest_daemon as daemon_module
+from ingest_daemon import ingest_daemon
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    '''
+        Daemon with 20251022 ~ 20251024 stored, mock server having 20251025
+        whose SFC file is cut down to 10 stations
+    '''
+    served = {'weather': tmp_path / 'served_weather', 'marine': tmp_path / 'served_marine'}
+    local = {'weather': tmp_path / 'weather', 'marine': tmp_path / 'marine'}
+    for folder in [*served.values(), *local.values()]:
+        folder.mkdir()
+    for day in ['20251022', '20251023', '20251024', '20251025']:
+        target = served['weather'] if day == '20251025' else local['weather']
+        shutil.copy(os.path.join(WEATHER_DIR, f'{day}.csv'), target / f'{day}.csv')
+        shutil.copy(os.path.join(MARINE_DIR, f'{day}1400.csv'), served['marine'] / f'{day}1400.csv')
+    shutil.copy(os.path.join(WEATHER_DIR, 'weather_meta.txt'), served['weather'])
+    shutil.copy(os.path.join(MARINE_DIR, 'marine_meta.txt'), served['marine'])
+    shutil.copy(os.path.join(MARINE_DIR, '202510241400.csv'), local['marine'])
+
+    df = pd.read_csv(served['weather'] / '20251025.csv', dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    df.head(10).to_csv(served['weather'] / '20251025.csv', index=False, encoding='utf-8-sig')
+
+    server = mock_kma_server(port=0, weather_dir=str(served['weather']), marine_dir=str(served['marine'])).start()
+    monkeypatch.setenv('KMA_BASE_URL', server.base_url)
+    monkeypatch.setenv('API_KEY', 'test')
+    monkeypatch.setenv('FILES_PATH_weather', str(local['weather']))
+    monkeypatch.setenv('FILES_PATH_marine', str(local['marine']))
+    monkeypatch.setenv('MERGED_FILE_SFC_PATH', str(tmp_path / 'merged_SFC.csv'))
+    monkeypatch.setenv('MERGED_FILE_MARINE_PATH', str(tmp_path / 'merged_marine.csv'))
+    monkeypatch.setenv('INGEST_STATE_PATH', str(tmp_path / 'ingest_state.json'))
+    monkeypatch.setenv('STN_INFS', '')
+
+    daemon = ingest_daemon(interval=0, upload=False)
+    daemon.now = lambda: datetime(2025, 10, 26, 9, 0)
+    yield daemon
+    server.stop()
+
+
+@pytest.mark.parametrize('step', ['10m', '1h', '2d'])
+def test_sub_daily_marine_step_is_rejected(step, monkeypatch):
+    monkeypatch.setenv('INGEST_STATE_PATH', os.devnull)
+    with pytest.raises(ValueError):
+        ingest_daemon(interval=0, marine_step=step, upload=False)
+
+
+def test_bad_day_is_quarantined_once_and_retried_after_backoff(daemon, tmp_path):
+    daemon.cycle()
+    assert daemon.bad['SFC'].keys() == {'20251025'}
+    assert os.path.exists(tmp_path / 'quarantine' / 'SFC' / '20251025.csv')
+    assert daemon.latest('marine') == datetime(2025, 10, 25, 14, 0)
+
+    # next cycles -> bad day is not fetched again before its retry time
+    assert daemon.pending('SFC') == []
+    daemon.cycle()
+    assert not os.path.exists(tmp_path / 'merged_SFC.csv')
+    assert daemon.metrics['SFC']['quarantined'] == 1
+
+    # after retry time -> fetched again, failure doubles the backoff
+    daemon.bad['SFC']['20251025']['retry_at'] = 0
+    assert daemon.pending('SFC') == ['20251025']
+    daemon.cycle()
+    assert daemon.bad['SFC']['20251025']['failures'] == 2
+
+    # kept after restart
+    with open(tmp_path / 'ingest_state.json', encoding='utf-8') as f:
+        assert json.load(f)['bad']['SFC']['20251025']['failures'] == 2
+
+
+def test_station_refresh_error_does_not_stop_cycle(daemon, monkeypatch):
+    daemon.stn_infs = ['SFC']
+    def broken(infs):
+        raise ValueError('broken cache')
+    monkeypatch.setattr(daemon.api, 'refresh_locations', broken)
+
+    daemon.cycle()
+    assert daemon.metrics['errors'] == 1 and 'broken cache' in daemon.metrics['last_error']
+    assert daemon.metrics['cycles'] == 1
+
+
+def test_merged_upload_is_batched(daemon, monkeypatch):
+    uploads = []
+    monkeypatch.setattr(daemon_module, 'load_into_s3', lambda files: uploads.append(list(files)))
+    daemon.upload = True
+    daemon.upload_interval = 3600
+    merged = daemon.datasets['SFC']['merged']
+
+    daemon.queued = {merged}
+    assert daemon.flush_uploads() == [merged]
+    daemon.queued = {merged}
+    assert daemon.flush_uploads() == []
+    assert daemon.flush_uploads(force=True) == [merged]
+    assert uploads == [[merged], [merged]]
+
+
+def test_merged_file_is_uploaded_after_kill(daemon, monkeypatch):
+    uploads = []
+    monkeypatch.setattr(daemon_module, 'load_into_s3', lambda files: uploads.append(list(files)))
+    daemon.upload = True
+    daemon.stn_infs = ['SFC']
+    # killed after publish, before the queue is flushed
+    def kill(infs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(daemon.api, 'refresh_locations', kill)
+    with pytest.raises(KeyboardInterrupt):
+        daemon.cycle()
+    assert uploads == []
+
+    restarted = ingest_daemon(interval=0, upload=True)
+    # SFC day of the mock server is quarantined -> only marine merged csv changed
+    merged = [daemon.datasets['marine']['merged']]
+    assert sorted(restarted.queued) == merged
+    assert restarted.flush_uploads() == merged
+    assert uploads == [merged]
+    # upload time is kept too -> not uploaded again right after the next restart
+    assert ingest_daemon(interval=0, upload=True).uploaded.keys() == set(merged)
+
+
+class fake_backend:
+    loaded = []
+
+    def connect(self):
+        pass
+
+    def prepare(self):
+        pass
+
+    def load_table(self, schema):
+        self.loaded.append(schema.table)
+        return [{'file': schema.stage_file, 'rows_parsed': 1, 'rows_loaded': 1, 'rejected': 0,
+                 'first_error': None}]
+
+    def close(self):
+        pass
+
+
+def test_changed_station_list_is_loaded_directly(daemon, tmp_path, monkeypatch):
+    # mock server serves a station list with one station less than the local file
+    stn_dir = tmp_path / 'served_stn'
+    stn_dir.mkdir()
+    df = pd.read_csv(os.path.join(ROOT, 'data', 'stn_SFC_info.csv'), dtype=str, keep_default_na=False,
+                     encoding='utf-8-sig')
+    df.iloc[1:].to_csv(stn_dir / 'stn_SFC_info.csv', index=False, encoding='utf-8-sig')
+    server = mock_kma_server(port=0, weather_dir=WEATHER_DIR, marine_dir=MARINE_DIR, stn_dir=str(stn_dir)).start()
+    daemon.api.base_url = server.base_url
+
+    local = tmp_path / 'stn_SFC_info.csv'
+    shutil.copy(os.path.join(ROOT, 'data', 'stn_SFC_info.csv'), local)
+    monkeypatch.setenv('STN_SFC_FILE_PATH', str(local))
+
+    uploads = []
+    monkeypatch.setattr(daemon_module, 'load_into_s3', lambda files: uploads.append(list(files)))
+    monkeypatch.setattr(daemon_module, 'get_backend', fake_backend)
+    fake_backend.loaded = []
+    daemon.upload = True
+    daemon.stn_infs = ['SFC']
+
+    try:
+        daemon.cycle()
+    finally:
+        server.stop()
+    assert fake_backend.loaded == ['station_surface_kor']
+    assert all(str(local) not in files for files in uploads)
+    assert len(pd.read_csv(local, encoding='utf-8-sig')) == len(df) - 1
+
+    # same list next time -> nothing loaded
+    daemon.cycle()
+    assert fake_backend.loaded == ['station_surface_kor']
@@ -0,0 +1,55 @@
+import os, gc, weakref
+import requests
+import pytest
+
+from conftest import WEATHER_DIR, MARINE_DIR
+from mock_kma_server import mock_kma_server, mock_config, kma_store
+from API_request import API_Request
+
+
+@pytest.fixture
+def server():
+    server = mock_kma_server(port=0, weather_dir=WEATHER_DIR, marine_dir=MARINE_DIR).start()
+    yield server
+    server.stop()
+
+
+def test_round_trip(server):
+    api = API_Request(base_url=server.base_url)
+    api.api_key = 'test'
+
+    weather = api.fetch_weather('20251025')
+    marine = api.fetch_marine('202510251400')
+    assert len(weather) > 0 and len(marine) > 0
+    assert set(weather['TM']) == {'20251025'}
+
+    # day without stored file -> empty response, not an error
+    assert api.fetch_weather('19990101').empty
+
+
+@pytest.mark.parametrize('tm', ['../../etc/passwd', '2025102５', '2025-10-25'])
+def test_tm_must_be_digits(server, tm):
+    response = requests.get(server.base_url + 'kma_sfcdd.php', params={'tm': tm, 'authKey': 'test'})
+    assert response.status_code == 400
+
+
+def test_same_seed_same_faults():
+    def faults(seed):
+        config = mock_config(error_rate=0.3, truncate_rate=0.3, seed=seed)
+        return [config.draw() for _ in range(50)]
+
+    drawn = faults(7)
+    assert drawn == faults(7)
+    assert {status for delay, fault, status in drawn if fault == '5xx'} <= {500, 502, 503}
+    assert all(0 <= keep <= 1 for delay, fault, keep in drawn if fault == 'truncate')
+
+
+def test_frame_cache_does_not_keep_store():
+    store = kma_store(WEATHER_DIR, MARINE_DIR, 'data')
+    path = os.path.join(MARINE_DIR, '202510241400.csv')
+    assert store.frame(path) is store.frame(path)
+
+    ref = weakref.ref(store)
+    del store
+    gc.collect()
+    assert ref() is None
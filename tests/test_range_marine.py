@@ -0,0 +1,81 @@
+import os, threading, time
+import pytest
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from conftest import WEATHER_DIR, MARINE_DIR
+from mock_kma_server import mock_kma_server
+from API_request import API_Request
+
+
+def test_windows_are_fetched_concurrently(tmp_path):
+    server = mock_kma_server(port=0, weather_dir=WEATHER_DIR, marine_dir=MARINE_DIR).start()
+    try:
+        api = API_Request(base_url=server.base_url)
+        api.api_key = 'test'
+
+        # one timestamp per day -> the barrier is passed only if all days are in flight together
+        barrier = threading.Barrier(4, timeout=10)
+        fetch = api.fetch_marine
+        def fetch_marine(tm, stn=None, **kwargs):
+            barrier.wait()
+            return fetch(tm, stn, **kwargs)
+        api.fetch_marine = fetch_marine
+
+        result = api.request_api_range_marine('202510221400', '202510251400', step='1d', workers=4,
+                                              out_dir=str(tmp_path / 'range'))
+    finally:
+        server.stop()
+
+    assert result['failed'] == []
+    assert sorted(os.listdir(tmp_path / 'range')) == ['20251022.csv', '20251023.csv', '20251024.csv', '20251025.csv']
+
+
+def test_latest_timestamp_wins(tmp_path):
+    api = API_Request()
+    frames = {
+        '202510250000': pd.DataFrame({'TM_KST': ['202510250000'], 'STN_ID': ['1'], 'WH': ['old']}),
+        '202510250100': pd.DataFrame({'TM_KST': ['202510250000'], 'STN_ID': ['1'], 'WH': ['new']})
+    }
+    # fetched in reverse order -> still the later timestamp wins
+    api.fetch_marine = lambda tm, stn=None, **kwargs: frames[tm]
+    api.request_api_range_marine('202510250000', '202510250100', step='1h', workers=2, out_dir=str(tmp_path))
+
+    df = pd.read_csv(tmp_path / '20251025.csv', dtype=str, encoding='utf-8-sig')
+    assert df['WH'].tolist() == ['new']
+
+
+@pytest.mark.parametrize('step', ['0m', '0h', '-1h', 0, -5, timedelta(0)])
+def test_non_positive_step_is_rejected(step):
+    with pytest.raises(ValueError):
+        API_Request().parse_step(step)
+
+
+def test_in_flight_requests_are_bounded(tmp_path, monkeypatch):
+    api = API_Request()
+    lock = threading.Lock()
+    state = {'submitted': 0, 'finished': 0, 'max': 0}
+    def fetch_marine(tm, stn=None, **kwargs):
+        time.sleep(0.001)
+        with lock:
+            state['finished'] += 1
+        return pd.DataFrame({'TM_KST': [tm], 'STN_ID': ['1'], 'WH': ['0.5']})
+    api.fetch_marine = fetch_marine
+
+    submit = ThreadPoolExecutor.submit
+    def counting_submit(pool, *args, **kwargs):
+        with lock:
+            state['submitted'] += 1
+            state['max'] = max(state['max'], state['submitted'] - state['finished'])
+        return submit(pool, *args, **kwargs)
+    monkeypatch.setattr(ThreadPoolExecutor, 'submit', counting_submit)
+
+    # 3 days of 10 minute steps -> 433 timestamps, at most workers * 4 in flight at once
+    result = api.request_api_range_marine('202510220000', '202510250000', step='10m', workers=2,
+                                          out_dir=str(tmp_path))
+
+    assert result['failed'] == []
+    assert state['submitted'] == 433
+    assert state['max'] <= 8
+    assert sorted(os.listdir(tmp_path)) == ['20251022.csv', '20251023.csv', '20251024.csv', '20251025.csv']
@@ -0,0 +1,68 @@
+import os
+import pytest
+
+from conftest import WEATHER_DIR, MARINE_DIR
+from mock_kma_server import mock_kma_server
+from API_request import API_Request
+from raw_archive import raw_archive, reparse
+
+
+def test_put_same_body_once_without_key(tmp_path):
+    archive = raw_archive(str(tmp_path / 'archive'))
+    url = 'http://x/api/typ01/url/kma_sfcdd.php?tm=20251025&disp=1&authKey=secret'
+    digest = archive.put(url, 'body\n#7777END')
+    assert archive.put(url.replace('secret', 'other'), 'body\n#7777END') == digest
+
+    assert archive.get('http://x/kma_sfcdd.php?disp=1&tm=20251025') == 'body\n#7777END'
+    stats = archive.stats()
+    assert stats['records'] == 2 and stats['keys'] == 1 and stats['objects'] == 1
+    with open(archive.index_path, encoding='utf-8') as f:
+        assert 'secret' not in f.read()
+
+
+@pytest.fixture
+def api():
+    server = mock_kma_server(port=0, weather_dir=WEATHER_DIR, marine_dir=MARINE_DIR).start()
+    api = API_Request(base_url=server.base_url)
+    api.api_key = 'test'
+    yield api
+    server.stop()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_reparse_daily_files_into_separate_folder(api, tmp_path):
+    live = tmp_path / 'live'
+    live.mkdir()
+    for tm in ('20251024', '20251025'):
+        api.save_csv(api.fetch_weather(tm), str(live / f'{tm}.csv'))
+    api.save_csv(api.fetch_marine('202510251400'), str(tmp_path / 'marine.csv'))
+
+    result = reparse('SFC', workers=2)
+    assert result == {'files': 2, 'rows': result['rows'], 'failed': []}
+    for tm in ('20251024', '20251025'):
+        assert read(tmp_path / 'reparse' / 'SFC' / f'{tm}.csv') == read(live / f'{tm}.csv')
+
+    result = reparse('marine', workers=1)
+    assert read(tmp_path / 'reparse' / 'marine' / '202510251400.csv') == read(tmp_path / 'marine.csv')
+
+
+def test_reparse_range_into_day_partitions(api, tmp_path):
+    api.request_api_range_marine('202510241400', '202510251400', step='12h', workers=4,
+                                 out_dir=str(tmp_path / 'range'))
+    # snapshot fetch of a tm outside the range -> not part of marine_range
+    api.fetch_marine('202510231400')
+
+    result = reparse('marine_range', workers=2, chunk_size=1)
+    rebuilt = tmp_path / 'reparse' / 'marine_range'
+    assert result['failed'] == []
+    assert sorted(os.listdir(rebuilt)) == sorted(os.listdir(tmp_path / 'range')) == ['20251024.csv', '20251025.csv']
+    for file in os.listdir(rebuilt):
+        assert read(rebuilt / file) == read(tmp_path / 'range' / file)
+
+    # range responses are not written as snapshots
+    reparse('marine', workers=1)
+    assert os.listdir(tmp_path / 'reparse' / 'marine') == ['202510231400.csv']
@@ -0,0 +1,32 @@
+import os
+import pandas as pd
+
+from conftest import WEATHER_DIR, MARINE_DIR
+from schema_registry import SCHEMAS, get_schema
+
+
+def test_sentinel_as_nan_keeps_int_columns(tmp_path):
+    schema = SCHEMAS['SFC']
+    df = pd.read_csv(os.path.join(WEATHER_DIR, '20251025.csv'), dtype=str, encoding='utf-8-sig')
+    df.loc[0, ['WS_MAX_TM', 'WS_AVG']] = ['-9', '-9.0']
+    path = tmp_path / 'sfc.csv'
+    df.to_csv(path, index=False)
+
+    read = schema.read_csv(path, sentinel_as_nan=True)
+    assert read['WS_MAX_TM'].dtype == 'Int64' and read['STN'].dtype == 'int64'
+    assert read['WS_MAX_TM'].isna().sum() == 1 and pd.isna(read.loc[0, 'WS_AVG'])
+    assert read['WS_MAX_TM'].iloc[1:].tolist() == df['WS_MAX_TM'].iloc[1:].astype(int).tolist()
+
+    # temperatures have no sentinel -> -9 C stays a value
+    assert read['TA_AVG'].notna().all()
+
+
+def test_read_matches_schema():
+    paths = [os.path.join(MARINE_DIR, '202510241400.csv'), os.path.join(MARINE_DIR, '202510251400.csv')]
+    schema = get_schema('MARINE')
+    many = schema.read_many(paths)
+    single = pd.concat([schema.read_csv(path, encoding='utf-8-sig') for path in paths], ignore_index=True)
+    pd.testing.assert_frame_equal(many, single)
+    for name, dtype in schema.dtypes.items():
+        if dtype != 'str':
+            assert many[name].dtype == dtype
@@ -0,0 +1,50 @@
+import os, shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import WEATHER_DIR
+from station_store import station_store
+
+DAYS = ['20251022', '20251023', '20251024']
+
+
+@pytest.fixture
+def store(tmp_path):
+    folder = tmp_path / 'weather'
+    folder.mkdir()
+    for day in DAYS:
+        shutil.copy(os.path.join(WEATHER_DIR, f'{day}.csv'), folder / f'{day}.csv')
+    store = station_store(str(tmp_path / 'store'), 'SFC')
+    store.refresh(str(folder))
+    return store, folder
+
+
+def test_values_match_daily_files(store):
+    store, folder = store
+    df = pd.read_csv(folder / '20251023.csv', encoding='utf-8-sig')
+    stn = int(df['STN'].iloc[0])
+    assert store.value('TA_AVG', '20251023', stn) == pytest.approx(df['TA_AVG'].iloc[0], abs=1e-4)
+
+    row = store.day('TA_AVG', '20251023')
+    assert row.shape == (len(store.stations),)
+    assert np.nanmean(row) == pytest.approx(df['TA_AVG'].mean(), abs=1e-3)
+
+
+@pytest.mark.parametrize('day', ['20251021', '20251025', '20141231'])
+def test_day_outside_store(store, day):
+    store, folder = store
+    with pytest.raises(KeyError, match=day):
+        store.day('TA_AVG', day)
+    assert np.isnan(store.value('TA_AVG', day, store.stations[0]))
+
+
+def test_refresh_appends_new_day(store):
+    store, folder = store
+    shutil.copy(os.path.join(WEATHER_DIR, '20251025.csv'), folder / '20251025.csv')
+    assert store.refresh(str(folder)) == 1
+
+    assert store.days == 4
+    assert not np.isnan(store.day('TA_AVG', '20251025')).all()
+    reopened = station_store(store.path, 'SFC')
+    assert reopened.days == 4 and reopened.stations == store.stations
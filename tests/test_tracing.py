@@ -0,0 +1,55 @@
+import json, contextvars
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from tracing import pipeline_tracer
+
+
+def test_nested_spans_and_summary():
+    tracer = pipeline_tracer()
+    with tracer.span('csv_merge.merge', type='SFC') as parent:
+        parent.add('rows', 10)
+        with tracer.span('csv_merge.read') as child:
+            child.add('bytes_in', 100)
+            assert tracer.current() is child
+        with pytest.raises(ValueError), tracer.span('csv_merge.read'):
+            raise ValueError('bad file')
+    assert tracer.current() is None
+
+    spans = {record.name: record for record in tracer.spans}
+    assert child.parent_id == parent.span_id and parent.parent_id is None
+    rows = {row['name']: row for row in tracer.summary()}
+    assert rows['csv_merge.read']['calls'] == 2 and rows['csv_merge.read']['errors'] == 1
+    assert rows['csv_merge.read']['bytes_in'] == 100 and rows['csv_merge.merge']['rows'] == 10
+    assert spans['csv_merge.merge'].attrs == {'type': 'SFC'}
+
+
+def test_worker_spans_keep_parent_with_copied_context():
+    tracer = pipeline_tracer()
+    with tracer.span('API_Request.range') as parent, ThreadPoolExecutor(max_workers=4) as pool:
+        def work(i):
+            with tracer.span('API_Request.fetch', i=i) as span:
+                return span.parent_id
+        # context copied in the submitting thread, like request_api_range_marine
+        futures = [pool.submit(contextvars.copy_context().run, work, i) for i in range(8)]
+        parents = [future.result() for future in futures]
+    assert parents == [parent.span_id] * 8
+
+
+def test_export_is_otlp_json(tmp_path):
+    tracer = pipeline_tracer()
+    with tracer.span('load_into_s3.load', key='raw/merged_SFC.csv') as span:
+        span.add('bytes_out', 5)
+        span.set(action='upload', retried=False)
+    path = tracer.export(str(tmp_path / 'trace.json'))
+
+    with open(path, encoding='utf-8') as f:
+        [otel] = json.load(f)['resourceSpans'][0]['scopeSpans'][0]['spans']
+    attrs = {attr['key']: attr['value'] for attr in otel['attributes']}
+    assert otel['traceId'] == tracer.trace_id and otel['status'] == {'code': 1}
+    assert attrs['bytes_out'] == {'intValue': '5'} and attrs['retried'] == {'boolValue': False}
+    assert int(otel['endTimeUnixNano']) >= int(otel['startTimeUnixNano'])
+
+    trace_id = tracer.trace_id
+    tracer.reset()
+    assert tracer.spans == [] and tracer.trace_id != trace_id
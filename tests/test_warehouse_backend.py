@@ -0,0 +1,104 @@
+import shutil
+import pytest
+
+from conftest import ROOT
+from schema_registry import SCHEMAS
+from warehouse_backend import warehouse_backend, duckdb_backend, snowflake_backend, get_backend
+import load_into_s3 as s3_module
+
+
+def test_backend_missing_method_fails_when_made():
+    class partial_backend(warehouse_backend):
+        def connect(self):
+            pass
+
+        def prepare(self):
+            pass
+
+    with pytest.raises(TypeError, match='load_table'):
+        partial_backend()
+
+
+def test_duckdb_loads_and_reports_rejected_rows(tmp_path, monkeypatch):
+    monkeypatch.setenv('DUCKDB_DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('DUCKDB_PATH', ':memory:')
+    shutil.copy(f'{ROOT}/data/stn_SFC_info.csv', tmp_path / 'stn_SFC_info.csv')
+
+    # one value can not be cast -> row skipped and counted like ON_ERROR='CONTINUE'
+    lines = (tmp_path / 'stn_SFC_info.csv').read_text(encoding='utf-8-sig').splitlines()
+    fields = lines[1].split(',')
+    fields[1] = 'east'
+    lines[1] = ','.join(fields)
+    (tmp_path / 'stn_SFC_info.csv').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    backend = get_backend('duckdb', save_log=lambda msg: None)
+    assert isinstance(backend, duckdb_backend)
+    backend.connect()
+    backend.prepare()
+    try:
+        [result] = backend.load_table(SCHEMAS['stn_SFC'])
+        count = backend.cursor.execute('SELECT COUNT(*) FROM RAW_DATA.station_surface_kor').fetchone()[0]
+    finally:
+        backend.close()
+
+    assert result['rows_parsed'] == len(lines) - 1
+    assert result['rejected'] == 1 and 'LON_degee' in result['first_error']
+    assert count == len(lines) - 2
+
+
+class fake_cursor:
+    '''
+        Records the SQL sent to Snowflake -> COPY returns one loaded file
+    '''
+    description = [('file',), ('status',), ('rows_parsed',), ('rows_loaded',), ('first_error',)]
+
+    def __init__(self):
+        self.sql = []
+
+    def execute(self, sql):
+        self.sql.append(' '.join(sql.split()))
+        return self
+
+    def fetchall(self):
+        return [('stn_SFC_info.csv.gz', 'LOADED', 10, 10, None)]
+
+
+@pytest.fixture
+def station_file(tmp_path, monkeypatch):
+    path = tmp_path / 'stn_SFC_info.csv'
+    shutil.copy(f'{ROOT}/data/stn_SFC_info.csv', path)
+    monkeypatch.setenv('STN_SFC_FILE_PATH', str(path))
+    return path
+
+
+@pytest.mark.parametrize('offset, direct', [(0, True), (-1, False)])
+def test_snowflake_direct_load_by_size(station_file, monkeypatch, offset, direct):
+    # file size == limit -> direct load, one byte over -> S3 stage
+    monkeypatch.setenv('DIRECT_LOAD_MAX_BYTES', str(station_file.stat().st_size + offset))
+    backend = snowflake_backend(save_log=lambda msg: None)
+    backend.cursor = fake_cursor()
+
+    [result] = backend.load_table(SCHEMAS['stn_SFC'])
+    create, *sql = backend.cursor.sql
+    table = SCHEMAS['stn_SFC'].table
+
+    assert create.startswith('CREATE')
+    assert result['rows_loaded'] == 10 and result['rejected'] == 0
+    if direct:
+        local = str(station_file.resolve()).replace('\\', '/')
+        assert sql[0] == f"PUT 'file://{local}' @RAW_DATA.%{table} AUTO_COMPRESS=TRUE OVERWRITE=TRUE"
+        assert sql[1].startswith(f'COPY INTO RAW_DATA.{table} FROM @RAW_DATA.%{table}/stn_SFC_info.csv.gz ')
+        assert len(sql) == 2
+    else:
+        assert sql[0].startswith(f'COPY INTO RAW_DATA.{table} FROM @my_s3_stage/stn_SFC_info.csv ')
+        assert len(sql) == 1
+
+
+@pytest.mark.parametrize('offset, uploaded', [(0, False), (-1, True)])
+def test_small_station_file_is_not_uploaded(station_file, monkeypatch, offset, uploaded):
+    monkeypatch.setenv('DIRECT_LOAD_MAX_BYTES', str(station_file.stat().st_size + offset))
+    loads = []
+    monkeypatch.setattr(s3_module.load_into_s3, 'load', lambda self, client, dir, s3_loc: loads.append(s3_loc))
+
+    s3_module.load_into_s3(files=[str(station_file)])
+    assert loads == (['raw/stn_SFC_info.csv'] if uploaded else [])
@@ -0,0 +1,236 @@
+import os, json, time, threading, contextvars
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+from dotenv import load_dotenv
+
+
+# Counters every span carries -> summed in the summary table
+COUNTERS = ('bytes_in', 'bytes_out', 'rows', 'retries')
+
+# The span currently running in this context (thread / task) -> parent of new spans
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class span_record:
+    '''
+        One timed unit of work in the pipeline (a request, a merge, an upload ...)
+        Spans opened inside another span become its children, so a run is a tree
+    '''
+
+    def __init__(self, name, trace_id, parent=None, **attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.stage = name.split('.')[0]
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = 'OK'
+        self.error = None
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.attrs = dict(attrs)
+
+
+    def add(self, key, value=1):
+        '''
+            Increase one of the counters (bytes_in, bytes_out, rows, retries)
+            param :
+                key : the name of counter
+                value : amount to add
+        '''
+        self.counters[key] = self.counters.get(key, 0) + value
+
+
+    def set(self, **attrs):
+        '''
+            Attach extra attributes (file name, url, tm ...) to the span
+        '''
+        self.attrs.update(attrs)
+
+
+    def fail(self, e):
+        '''
+            Mark the span as failed -> for callers that catch the exception themselves
+        '''
+        self.status = 'ERROR'
+        self.error = f'{type(e).__name__}: {e}'
+
+
+    @property
+    def elapsed(self):
+        end = self.end_ns if self.end_ns else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+
+    def to_otel(self):
+        '''
+            Convert the span into the OpenTelemetry (OTLP/JSON) span layout
+        '''
+        attributes = []
+        for key, val in {**self.attrs, **self.counters}.items():
+            if isinstance(val, bool):
+                value = {'boolValue': val}
+            elif isinstance(val, int):
+                value = {'intValue': str(val)}
+            elif isinstance(val, float):
+                value = {'doubleValue': val}
+            else:
+                value = {'stringValue': str(val)}
+            attributes.append({'key': key, 'value': value})
+
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': attributes,
+            'status': {'code': 1 if self.status == 'OK' else 2}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.error:
+            span['status']['message'] = self.error
+        return span
+
+
+class pipeline_tracer:
+    '''
+        Tracer shared by API_Request, csv_merge, load_into_s3 and snowflake_controller
+        Every stage opens spans through the same instance (tracing.tracer) so that
+        one run ends up in one trace file with one summary table
+    '''
+
+    def __init__(self, service='DE07_project2'):
+        load_dotenv()
+        self.service = service
+        self.trace_dir = os.getenv('TRACE_DIR', 'data/trace')
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def span(self, name, **attrs):
+        '''
+            Open a span for the with-block; it is closed (and timed) on exit
+            Exceptions are recorded on the span and raised again
+
+            param :
+                name : stage.step name (ex - API_Request.request_api_weather)
+                attrs : extra attributes for the span
+        '''
+        record = span_record(name, self.trace_id, _current_span.get(), **attrs)
+        token = _current_span.set(record)
+        try:
+            yield record
+        except Exception as e:
+            record.fail(e)
+            raise
+        finally:
+            record.end_ns = time.time_ns()
+            _current_span.reset(token)
+            with self.lock:
+                self.spans.append(record)
+
+
+    def current(self):
+        '''
+            Return the running span or None -> used to add counters from helpers
+        '''
+        return _current_span.get()
+
+
+    def export(self, path=None):
+        '''
+            Write all finished spans into a JSON file (OTLP/JSON layout)
+            param :
+                path : target file, if None -> TRACE_DIR/trace_{datetime}.json
+        '''
+        if path is None:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(self.trace_dir, f'trace_{stamp}.json')
+
+        with self.lock:
+            spans = [record.to_otel() for record in self.spans]
+
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': self.service}}
+                ]},
+                'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': spans}]
+            }]
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+
+        return path
+
+
+    def summary(self):
+        '''
+            Roll every span up by name -> calls, wall time, bytes, rows, retries, errors
+            Returns list of dict sorted by total time
+        '''
+        table = defaultdict(lambda: {'calls': 0, 'errors': 0, 'wall_s': 0.0, **dict.fromkeys(COUNTERS, 0)})
+
+        with self.lock:
+            spans = list(self.spans)
+
+        for record in spans:
+            row = table[record.name]
+            row['calls'] += 1
+            row['errors'] += record.status != 'OK'
+            row['wall_s'] += record.elapsed
+            for key in COUNTERS:
+                row[key] += record.counters.get(key, 0)
+
+        return sorted(({'name': name, **row} for name, row in table.items()),
+                      key=lambda row: row['wall_s'], reverse=True)
+
+
+    def print_summary(self):
+        '''
+            Print the summary table at the end of run
+        '''
+        rows = self.summary()
+        if not rows:
+            print('No span recorded')
+            return
+
+        width = max(len(row['name']) for row in rows)
+        print(f"{'SPAN':<{width}} {'CALLS':>6} {'ERR':>4} {'WALL(s)':>9} "
+              f"{'BYTES_IN':>12} {'BYTES_OUT':>12} {'ROWS':>10} {'RETRY':>6}")
+        for row in rows:
+            print(f"{row['name']:<{width}} {row['calls']:>6} {row['errors']:>4} {row['wall_s']:>9.3f} "
+                  f"{row['bytes_in']:>12} {row['bytes_out']:>12} {row['rows']:>10} {row['retries']:>6}")
+
+
+    def reset(self):
+        '''
+            Drop finished spans and start a new trace id
+            -> long running process (ingest_daemon) exports one trace per cycle
+        '''
+        with self.lock:
+            self.spans = []
+        self.trace_id = os.urandom(16).hex()
+
+
+    def finish(self):
+        '''
+            End of run -> export trace file and show summary table
+        '''
+        if not self.spans:
+            return None
+        path = self.export()
+        self.print_summary()
+        print(f'Trace saved : {path}')
+        return path
+
+
+# Shared tracer -> import this in every stage
+tracer = pipeline_tracer()
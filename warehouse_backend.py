@@ -0,0 +1,318 @@
+import os, glob
+from abc import ABC, abstractmethod
+from dotenv import load_dotenv
+
+
+# Local file of each dataset (same .env keys as load_into_s3)
+LOCAL_FILES = {
+    'SFC': 'MERGED_FILE_SFC_PATH',
+    'marine': 'MERGED_FILE_MARINE_PATH',
+    'stn_SFC': 'STN_SFC_FILE_PATH',
+    'stn_BUOY': 'STN_BUOY_FILE_PATH'
+}
+
+
+def local_file(schema):
+    '''
+        Local csv of dataset -> path in .env, default data/{stage_file}
+    '''
+    load_dotenv()
+    return os.getenv(LOCAL_FILES.get(schema.name, ''), os.path.join('data', schema.stage_file))
+
+
+def is_direct_load(path):
+    '''
+        True if the file is small enough to be loaded without S3
+        (size <= DIRECT_LOAD_MAX_BYTES in .env, default 1MB)
+        load_into_s3 skips these files, snowflake_backend PUTs them into the table stage
+    '''
+    load_dotenv()
+    max_bytes = int(os.getenv('DIRECT_LOAD_MAX_BYTES', 1024 * 1024))
+    return bool(path) and os.path.exists(path) and os.path.getsize(path) <= max_bytes
+
+
+class warehouse_backend(ABC):
+    '''
+        Warehouse used by snowflake_controller
+        A backend connects, prepares (stage, schemas) and loads the raw tables;
+        every other step of command_map is plain SQL run through self.cursor
+        connect / prepare / load_table are abstract -> a backend missing one
+        fails when it is made, not in the middle of a load
+
+        param :
+            save_log : function storing history into the log file
+    '''
+
+    name = None
+
+
+    def __init__(self, save_log=print):
+        load_dotenv()
+        self.save_log = save_log
+        self.conn = None
+        self.cursor = None
+
+
+    @abstractmethod
+    def connect(self):
+        '''
+            Open self.conn and self.cursor
+        '''
+
+
+    @abstractmethod
+    def prepare(self):
+        '''
+            Make the warehouse ready for command_map (stage, schemas ...)
+        '''
+
+
+    @abstractmethod
+    def load_table(self, schema):
+        '''
+            Create the raw table of dataset and load its data
+            param :
+                schema : dataset_schema from schema_registry
+            Returns load result of each file
+                (dict of file, rows_parsed, rows_loaded, rejected, first_error)
+        '''
+
+
+    @staticmethod
+    def load_result(file, rows_parsed, rows_loaded, first_error=None):
+        return {
+            'file': file,
+            'rows_parsed': int(rows_parsed or 0),
+            'rows_loaded': int(rows_loaded or 0),
+            'rejected': int(rows_parsed or 0) - int(rows_loaded or 0),
+            'first_error': first_error
+        }
+
+
+    def close(self):
+        if self.cursor is not None:
+            self.cursor.close()
+        if self.conn is not None:
+            self.conn.close()
+
+
+class snowflake_backend(warehouse_backend):
+    '''
+        Snowflake -> raw tables are loaded from S3 through the stage 'my_s3_stage'
+        Small local files (station lists) are PUT into the table stage and copied
+        from there -> no S3 upload, head_object check or AWS credential needed
+    '''
+
+    name = 'snowflake'
+
+
+    def connect(self):
+        # import here -> snowflake connector is only needed for this backend
+        import snowflake.connector
+
+        self.conn = snowflake.connector.connect(
+            user=os.getenv('SNOWFLAKE_USER'),
+            password=os.getenv('SNOWFLAKE_PASSWORD'),
+            account=os.getenv('SNOWFLAKE_ACCOUNT'),
+            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
+            database=os.getenv('SNOWFLAKE_DATABASE'),
+            schema=os.getenv('SNOWFLAKE_SCHEMA')
+        )
+        self.cursor = self.conn.cursor()
+
+
+    def prepare(self):
+        """
+            Check if Stage already exists in Snowflake; if not, create one.
+        """
+        try:
+            stage_check = '''
+                SHOW STAGES LIKE 'my_s3_stage';
+            '''
+            self.cursor.execute(stage_check)
+            result = self.cursor.fetchall()
+
+            if len(result) == 0:
+                print('Stage Not Found -> Creating new stage \'my_s3_stage\'')
+                stage_sql = f'''
+                    CREATE OR REPLACE STAGE RAW_DATA.MY_S3_STAGE
+                    URL='s3://{os.getenv("AWS_BUCKET")}/raw/'
+                    CREDENTIALS=(
+                        AWS_KEY_ID='{os.getenv("AWS_KEY")}'
+                        AWS_SECRET_KEY='{os.getenv("AWS_SECRETE_KEY")}'
+                    )
+                    FILE_FORMAT=(TYPE=CSV FIELD_OPTIONALLY_ENCLOSED_BY='"' SKIP_HEADER=1);
+                '''
+                self.cursor.execute(stage_sql)
+                print("Stage 'my_s3_stage' created successfully")
+                self.save_log("Stage 'my_s3_stage' created successfully")
+            else:
+                print("Stage 'my_s3_stage' already exists (skipped creation)")
+                self.save_log("Stage 'my_s3_stage' already exists")
+
+        except Exception as e:
+            print(f"Error verifying/creating stage: {e}")
+            self.save_log(f"Error verifying/creating stage: {e}")
+
+
+    def load_table(self, schema):
+        self.cursor.execute(schema.create_sql())
+
+        path = local_file(schema)
+        if is_direct_load(path):
+            # Table stage (@%table) of the new table -> PUT compresses file into .gz
+            stage = f'@RAW_DATA.%{schema.table}'
+            local = os.path.abspath(path).replace('\\', '/')
+            self.cursor.execute(f"PUT 'file://{local}' {stage} AUTO_COMPRESS=TRUE OVERWRITE=TRUE")
+            self.save_log(f'{os.path.basename(path)} PUT into {stage} (direct load)')
+            self.cursor.execute(schema.copy_sql(stage=stage, file=os.path.basename(path) + '.gz'))
+        else:
+            self.cursor.execute(schema.copy_sql())
+
+        # COPY returns one row per file -> rows skipped by ON_ERROR='CONTINUE' are
+        # rows_parsed - rows_loaded ('Copy executed with 0 files processed' has status only)
+        names = [desc[0].lower() for desc in self.cursor.description]
+        results = []
+        for row in self.cursor.fetchall():
+            row = dict(zip(names, row))
+            if 'file' in row:
+                results.append(self.load_result(row['file'], row.get('rows_parsed'),
+                                                row.get('rows_loaded'), row.get('first_error')))
+        return results
+
+
+class duckdb_backend(warehouse_backend):
+    '''
+        Embedded DuckDB -> raw tables are loaded from local files without S3 or account
+        The merged csv (data/merged_*.csv) is used if exists, else the daily files directly
+        Snowflake only functions used by command_map are added as macros
+
+        env :
+            DUCKDB_PATH : database file (default ':memory:')
+            DUCKDB_DATA_DIR : folder of merged / station csv (default 'data')
+    '''
+
+    name = 'duckdb'
+
+    # Snowflake FLOAT is 8 bytes -> DOUBLE in DuckDB
+    TYPE_MAP = {'FLOAT': 'DOUBLE', 'STRING': 'VARCHAR'}
+
+    # Snowflake functions used in command_map SQL
+    MACROS = [
+        'CREATE OR REPLACE MACRO TO_DATE(x) AS CAST(x AS DATE)'
+    ]
+
+
+    def __init__(self, save_log=print):
+        super().__init__(save_log)
+        self.path = os.getenv('DUCKDB_PATH', ':memory:')
+        self.data_dir = os.getenv('DUCKDB_DATA_DIR', 'data')
+
+        # daily files of each dataset -> used when merged csv is not made
+        self.partitions = {
+            'SFC': os.getenv('FILES_PATH_weather', 'data/weather_condition'),
+            'marine': os.getenv('FILES_PATH_marine', 'data/marine_condition')
+        }
+
+
+    def connect(self):
+        # import here -> duckdb is only needed for this backend
+        import duckdb
+
+        self.conn = duckdb.connect(self.path)
+        self.cursor = self.conn.cursor()
+
+
+    def prepare(self):
+        for schema in ('RAW_DATA', 'ANALYTICS'):
+            self.cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+        for macro in self.MACROS:
+            self.cursor.execute(macro)
+        self.save_log(f'DuckDB prepared at {self.path}')
+
+
+    def source(self, schema):
+        '''
+            Local files of dataset -> merged csv if exists else the daily files
+        '''
+        merged = os.path.join(self.data_dir, schema.stage_file)
+        if os.path.exists(merged):
+            return [merged]
+
+        partition = self.partitions.get(schema.name)
+        if partition:
+            files = sorted(glob.glob(os.path.join(partition, '*.csv')))
+            if files:
+                return files
+
+        raise FileNotFoundError(f'No local file for {schema.name} : {merged}')
+
+
+    def select_sql(self, schema, files):
+        '''
+            SELECT casting the csv (read as text with schema columns) into the table types
+            DATE columns take the first 8 digits -> both yyyymmdd and yyyymmddhhmm work
+            A row with a value failing the cast is flagged 'rejected' with the column
+            in 'first_error', the file of each row is in 'filename'
+        '''
+        exprs, fails = [], []
+        for col in schema.columns:
+            name = '"' + col.name.replace('"', '""') + '"'
+            if col.sql_type == 'DATE':
+                cast = f"TRY_STRPTIME(SUBSTR({name}, 1, 8), '%Y%m%d')::DATE"
+            else:
+                cast = f'TRY_CAST({name} AS {self.TYPE_MAP.get(col.sql_type, col.sql_type)})'
+            exprs.append(f'{cast} AS {col.sql_name}')
+            fails.append((f'{name} IS NOT NULL AND {cast} IS NULL', col.name))
+
+        exprs.append('(' + ' OR '.join(f'({fail})' for fail, _ in fails) + ') AS rejected')
+        exprs.append('CASE ' + ' '.join(f"WHEN {fail} THEN 'Can not cast {name}'" for fail, name in fails)
+                     + ' END AS first_error')
+        exprs.append('filename')
+
+        # Columns given from schema -> no sniffing of each file
+        file_list = ', '.join("'" + path.replace("'", "''") + "'" for path in files)
+        columns = ', '.join("'" + col.name + "': 'VARCHAR'" for col in schema.columns)
+        return (f"SELECT {', '.join(exprs)}\n"
+                f"FROM read_csv([{file_list}], header=true, auto_detect=false, delim=',', "
+                f"quote='\"', filename=true, columns={{{columns}}})")
+
+
+    def load_table(self, schema):
+        files = self.source(schema)
+        self.cursor.execute(schema.create_sql(type_map=self.TYPE_MAP))
+
+        # csv is read once into a temp table -> rejected rows are not loaded (ON_ERROR='CONTINUE')
+        # and are counted per file like the result of Snowflake COPY
+        self.cursor.execute('CREATE OR REPLACE TEMP TABLE copy_stage AS\n' + self.select_sql(schema, files))
+        names = ', '.join(col.sql_name for col in schema.columns)
+        self.cursor.execute(f'INSERT INTO RAW_DATA.{schema.table}\n'
+                            f'SELECT {names} FROM copy_stage WHERE NOT rejected')
+        rows = self.cursor.fetchall()[0][0]
+
+        self.cursor.execute('''
+            SELECT filename, COUNT(*), COUNT(*) FILTER (WHERE NOT rejected), MIN(first_error)
+            FROM copy_stage GROUP BY filename ORDER BY filename
+        ''')
+        results = [self.load_result(*row) for row in self.cursor.fetchall()]
+        self.cursor.execute('DROP TABLE copy_stage')
+
+        self.save_log(f'{rows} rows loaded into RAW_DATA.{schema.table} from {len(files)} files')
+        return results
+
+
+BACKENDS = {
+    'snowflake': snowflake_backend,
+    'duckdb': duckdb_backend
+}
+
+
+def get_backend(name=None, save_log=print):
+    '''
+        Backend by name (WAREHOUSE_BACKEND in .env if None, default snowflake)
+    '''
+    load_dotenv()
+    name = (name or os.getenv('WAREHOUSE_BACKEND', 'snowflake')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown warehouse backend : {name} (choose {list(BACKENDS)})')
+    return BACKENDS[name](save_log)